@@ -0,0 +1,82 @@
+"""
+Conditional and compressed JSON responses for the data-heavy API endpoints.
+Bodies are serialised and compressed once per snapshot; each request then only
+picks the matching variant or answers 304 Not Modified.
+"""
+
+import gzip
+import json
+import hashlib
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+class EncodedBody:
+    """A JSON body and its precomputed content-encoded variants"""
+
+    def __init__(self, payload, etag, variants=None):
+        self.etag = etag
+        if variants is not None:
+            self.variants = variants
+            return
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=5)
+
+
+def encoded_snapshot_json(snapshot, name, builder):
+    """
+    Memoise builder(snapshot) as an EncodedBody on the snapshot. Bodies the
+    pipeline already published to shared memory are served from there.
+    """
+    etag = f"{snapshot.etag}-{name}"
+    if name in snapshot.shared_bodies:
+        return EncodedBody(None, etag, variants=snapshot.shared_bodies[name])
+    return snapshot.memo(f"encoded:{name}", lambda snap: EncodedBody(builder(snap), etag))
+
+
+def _pick_encoding(encoded):
+    offered = [e for e in ("br", "gzip") if e in encoded.variants]
+    if not offered:
+        return "identity"
+    return request.accept_encodings.best_match(offered) or "identity"
+
+
+def json_response(encoded):
+    """Serve an EncodedBody with a strong per-encoding ETag and 304 support"""
+    encoding = _pick_encoding(encoded)
+    etag = encoded.etag if encoding == "identity" else f"{encoded.etag}-{encoding}"
+
+    # Shared-memory variants are buffers; WSGI needs bytes
+    body = encoded.variants[encoding]
+    if not isinstance(body, bytes):
+        body = body.to_pybytes()
+    response = current_app.response_class(body, mimetype='application/json')
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def query_etag(snapshot, name, args):
+    """ETag for a parameterised view of a snapshot (e.g. a filtered page)"""
+    query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    return f"{snapshot.etag}-{name}-{digest}"
+
+
+def not_modified(etag):
+    """True if the client already holds the representation tagged etag"""
+    return request.if_none_match.contains(etag)
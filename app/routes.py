@@ -1,15 +1,13 @@
-from flask import Blueprint, render_template, jsonify, request
-import pandas as pd
-import os
-import time
+from flask import Blueprint, render_template, jsonify, request, current_app
+from datetime import date
 from app.scheduler import refresh_now, update_interval, get_next_run_time, get_interval
 from app.services.data_processor import get_current_model_info, switch_model
 from app.services import market_data
+from app.services import data_store, data_query, events, versioning, archive, search_index, rollups, cdc, shared_snapshot
+from app import http_cache
 
 main = Blueprint('main', __name__)
 
-DATA_FILE = os.path.join("data", "final_data.csv")
-
 @main.route('/')
 def index():
     return render_template('index.html')
@@ -40,33 +38,211 @@ def settings():
 
 @main.route('/api/data')
 def get_data():
-    if os.path.exists(DATA_FILE):
+    """
+    Processed articles. Optional query parameters: page, limit, fields,
+    impact_level, event_flag, operational_tag, source, cluster, since, until.
+    """
+    if data_store.has_data():
         try:
-            df = pd.read_csv(DATA_FILE)
-            # Replace NaN with None (null in JSON)
-            df = df.where(pd.notnull(df), None)
-            return jsonify(df.to_dict(orient='records'))
+            snapshot = data_store.get_snapshot()
+            if not data_query.has_query(request.args):
+                encoded = http_cache.encoded_snapshot_json(snapshot, 'data', lambda snap: snap.records())
+                return http_cache.json_response(encoded)
+
+            # Filtered pages are cheap to build, so only revalidation is cached
+            etag = http_cache.query_etag(snapshot, 'data', request.args)
+            if http_cache.not_modified(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            rows, total, page, limit = data_query.query_records(snapshot, request.args)
+            response = jsonify(rows)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            response.headers['X-Total-Count'] = str(total)
+            if limit is not None:
+                response.headers['X-Page'] = str(page)
+                response.headers['X-Per-Page'] = str(limit)
+            return response
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     else:
         return jsonify([]), 200
 
-@main.route('/api/stats')
-def get_stats():
-    if os.path.exists(DATA_FILE):
+@main.route('/api/data/changes')
+def get_data_changes():
+    """
+    Articles changed since ?since=<version>, plus the run's cluster labels.
+    Returns the full snapshot ("full": true) when since is omitted or the
+    change log no longer covers it.
+    """
+    since = request.args.get('since')
+    if since is not None:
         try:
-            df = pd.read_csv(DATA_FILE)
-            stats = {
-                "total_articles": len(df),
-                "high_risk": len(df[df['impact_level'] == 'High Risk']),
-                "opportunity": len(df[df['impact_level'] == 'Opportunity']),
-                "major_events": len(df[df['event_flag'] == 'Major Event']),
-                "last_updated": time.ctime(os.path.getmtime(DATA_FILE))
+            since = int(since)
+        except ValueError:
+            return jsonify({"error": "since must be an integer version"}), 400
+    try:
+        snapshot = data_store.get_snapshot()
+        latest = snapshot.version
+        changes = None
+        if since is not None and since <= latest:
+            changes = versioning.changes_since(since, latest)
+        if changes is None:
+            encoded = http_cache.encoded_snapshot_json(
+                snapshot, 'changes-full', lambda snap: {"version": snap.version, "full": True, "items": snap.records()})
+            return http_cache.json_response(encoded)
+
+        def build_delta(snap):
+            return {
+                "version": latest,
+                "full": False,
+                "inserted": snap.records_by_id(changes["inserted"]),
+                "updated": snap.records_by_id(changes["updated"]),
+                "removed": changes["removed"],
+                # Unchanged articles can still move to a renumbered or renamed cluster
+                "labels": snap.memo('run_labels', lambda s: versioning.run_labels(s.df)) if since < latest else None
             }
-            return jsonify(stats)
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-    return jsonify({"total_articles": 0, "high_risk": 0, "opportunity": 0, "major_events": 0, "last_updated": "Never"})
+
+        # One body per (since, version), compressed once and revalidated by ETag
+        return http_cache.json_response(http_cache.encoded_snapshot_json(snapshot, f'changes-{since}', build_delta))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@main.route('/api/cdc')
+def get_cdc_events():
+    """
+    Article change events with offset > ?after= (default: from the start),
+    at most ?limit= of them. Resume by passing the returned next offset.
+    """
+    try:
+        after = int(request.args.get('after', -1))
+        limit = min(int(request.args.get('limit', cdc.DEFAULT_READ_LIMIT)), cdc.MAX_READ_LIMIT)
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be >= 1"}), 400
+    try:
+        events, latest = cdc.read_events(after, limit)
+        return jsonify({
+            "events": events,
+            "next": events[-1]["offset"] if events else max(after, -1),
+            "latest": latest
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@main.route('/api/versions')
+def get_versions():
+    """Live snapshot version and the generations retained for rollback"""
+    return jsonify(versioning.version_info())
+
+@main.route('/api/versions/rollback', methods=['POST'])
+def rollback_version():
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not isinstance(version, int):
+        return jsonify({"status": "error", "message": "Integer version required"}), 400
+    try:
+        with versioning.file_lock(versioning.PUBLISH_LOCK):
+            pointer = versioning.rollback(version)
+            if shared_snapshot.enabled():
+                # Workers serve the shared-memory copy, so it has to move back too
+                shared_snapshot.publish_frame(data_store.load_frame(data_store.data_path()), version)
+            data_store.publish_version()
+            cdc.reconcile()
+        return jsonify({"status": "success", "current": pointer})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@main.route('/api/search')
+def search_articles():
+    """
+    Ranked full-text search over titles and summaries. Parameters: q (prefix
+    match on the last word), impact_level, source, since, until, page, limit.
+    """
+    try:
+        rows, total, page, limit = search_index.search(request.args)
+        response = jsonify(rows)
+        response.headers['X-Total-Count'] = str(total)
+        response.headers['X-Page'] = str(page)
+        response.headers['X-Per-Page'] = str(limit)
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@main.route('/api/trends')
+def get_trends():
+    """
+    Article counts over time. series=tag (hourly per operational_tag),
+    impact (hourly per impact_level) or source (daily per Source and
+    impact_level). Optional: since, until, keys, impact_level, resolution=day.
+    """
+    def split(name):
+        return [v.strip() for v in request.args.get(name, '').split(',') if v.strip()] or None
+
+    try:
+        rows = rollups.query(
+            request.args.get('series', 'tag'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            keys=split('keys'),
+            impact_level=split('impact_level'),
+            resolution=request.args.get('resolution'),
+        )
+        return jsonify(rows)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@main.route('/api/archive')
+def get_archive():
+    """Archived articles for ?since=YYYY-MM-DD&until=YYYY-MM-DD (optional fields=)"""
+    try:
+        since = date.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = date.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({"error": "since/until must be YYYY-MM-DD"}), 400
+    if since is None:
+        return jsonify({"error": "since is required"}), 400
+
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    try:
+        df = archive.query(since, until, fields)
+        return jsonify(data_store.frame_records(df))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@main.route('/api/stats')
+def get_stats():
+    try:
+        body, etag = data_store.get_stats_document()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if body is None:
+        return jsonify({"total_articles": 0, "high_risk": 0, "opportunity": 0, "major_events": 0, "last_updated": "Never"})
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@main.route('/api/events')
+def event_stream():
+    """Server-Sent Events: pipeline_finished, pipeline_failed and high_risk_article"""
+    last_id = request.headers.get('Last-Event-ID')
+    response = current_app.response_class(events.stream(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @main.route('/api/refresh', methods=['POST'])
 def refresh_data():
@@ -143,6 +319,32 @@ def get_inflation():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@main.route('/api/market/history/<series>')
+def get_market_history(series):
+    """
+    Full history of usd_lkr, gold, fuel or inflation. Optional: start, end
+    (YYYY-MM-DD) and resolution (auto, daily, weekly, monthly).
+    """
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({"error": "start/end must be YYYY-MM-DD"}), 400
+    if start and end and start > end:
+        return jsonify({"error": "start must not be after end"}), 400
+    try:
+        data = market_data.get_market_history(
+            series,
+            start=start.isoformat() if start else None,
+            end=end.isoformat() if end else None,
+            resolution=request.args.get('resolution', 'auto')
+        )
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @main.route('/api/market/update', methods=['POST'])
 def update_market():
     """Manually trigger market data update"""
@@ -197,8 +399,9 @@ def get_location_data():
     """Get location frequency data for heatmap"""
     try:
         from app.services.nlp_service import get_location_summary
-        data = get_location_summary()
-        return jsonify(data)
+        snapshot = data_store.get_snapshot()
+        encoded = http_cache.encoded_snapshot_json(snapshot, 'locations', lambda snap: get_location_summary())
+        return http_cache.json_response(encoded)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
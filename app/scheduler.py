@@ -1,8 +1,12 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.data_processor import run_pipeline
 from app.services.market_data import update_market_data, initialize_sample_data
+from app.services.archive import maintain as maintain_archive
+from app.services.market_store import market_store
 import atexit
 import logging
+import os
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -10,6 +14,23 @@ logger = logging.getLogger(__name__)
 scheduler = None
 current_interval = 15
 
+# Web workers without a scheduler ask the scheduler process for a refresh through these files
+REFRESH_REQUEST_FILE = os.path.join("data", "refresh.request")
+HEARTBEAT_FILE = os.path.join("data", "scheduler.heartbeat")
+HEARTBEAT_SECONDS = 5
+
+def _poll_requests():
+    """Mark this scheduler alive and run refreshes other processes asked for"""
+    os.makedirs(os.path.dirname(HEARTBEAT_FILE) or ".", exist_ok=True)
+    with open(HEARTBEAT_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    try:
+        os.remove(REFRESH_REQUEST_FILE)
+    except FileNotFoundError:
+        return
+    logger.info("Refresh requested by another process")
+    refresh_now()
+
 def start_scheduler():
     global scheduler, current_interval
     if scheduler is None:
@@ -19,6 +40,14 @@ def start_scheduler():
         
         # Update market data daily at 9 AM
         scheduler.add_job(func=update_market_data, trigger="cron", hour=9, minute=0, id='market_data_job')
+
+        # Compact archive partitions and apply retention nightly
+        scheduler.add_job(func=maintain_archive, trigger="cron", hour=2, minute=30, id='archive_maintenance_job')
+
+        # Rewrite the market journal without superseded observations weekly
+        scheduler.add_job(func=market_store.compact, trigger="cron", day_of_week="sun", hour=3, minute=0, id='market_compaction_job')
+
+        scheduler.add_job(func=_poll_requests, trigger="interval", seconds=HEARTBEAT_SECONDS, id='refresh_request_job')
         
         scheduler.start()
         logger.info(f"Scheduler started. Pipeline will run every {current_interval} minutes.")
@@ -39,6 +68,15 @@ def refresh_now():
     if scheduler and scheduler.running:
         scheduler.add_job(func=run_pipeline, trigger="date", id=f'manual_refresh_{datetime.now().timestamp()}')
         return True
+    try:
+        alive = time.time() - os.path.getmtime(HEARTBEAT_FILE) < 3 * HEARTBEAT_SECONDS
+    except OSError:
+        alive = False
+    if alive:
+        # The scheduler runs in another process and picks this up on its next poll
+        with open(REFRESH_REQUEST_FILE, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
     return False
 
 def update_interval(minutes):
@@ -64,3 +102,16 @@ def get_next_run_time():
 
 def get_interval():
     return current_interval
+
+def run_forever():
+    """Run the scheduler in its own process, e.g. next to multiple web workers"""
+    start_scheduler()
+    try:
+        while True:
+            time.sleep(60)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    run_forever()
@@ -0,0 +1,323 @@
+"""
+Date-partitioned article archive.
+
+Every pipeline run appends its new and changed articles to one partition per
+publication day (data/archive/date=YYYY-MM-DD/part-<version>.parquet). A
+background job compacts the small per-run parts of each day and applies the
+retention policy; time-range queries only open the partitions in range.
+
+Bulky text columns are stored dictionary-compressed (see text_codec) and only
+decompressed when a query asks for them. Raw feed payloads are kept alongside
+under data/archive/raw/date=YYYY-MM-DD/, compressed the same way, whenever a
+source's payload differs from the last one stored.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import logging
+from datetime import date, datetime, timedelta
+import pandas as pd
+from app.services import snapshot_format, text_codec
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.path.join("data", "archive")
+LOCAL_TZ = "Asia/Colombo"
+
+# Days older than this are deleted
+RETENTION_DAYS = int(os.environ.get("SIGNALS_ARCHIVE_RETENTION_DAYS", "365"))
+# Days older than this keep only their most significant articles, without bulky text
+DOWNSAMPLE_AFTER_DAYS = int(os.environ.get("SIGNALS_ARCHIVE_DOWNSAMPLE_DAYS", "90"))
+DOWNSAMPLE_MAX_ROWS = 200
+DOWNSAMPLE_DROP_COLUMNS = ["Summary", "cleaned"]
+DOWNSAMPLED_MARKER = "_DOWNSAMPLED"
+
+# Text columns stored compressed as <column>__z, with the dictionary ID per row
+COMPRESSED_COLUMNS = ["Summary", "cleaned"]
+COMPRESSED_SUFFIX = "__z"
+DICT_COLUMN = "_zdict"
+
+# Hash of the last raw payload stored per source
+RAW_STATE_NAME = "_last.json"
+_raw_lock = threading.Lock()
+# state path -> {source slug: payload hash}
+_raw_hashes = {}
+
+
+def _archive_dir(data_dir):
+    return os.path.join(data_dir, "archive")
+
+
+def _part_suffix():
+    return ".parquet" if snapshot_format.available() else ".csv"
+
+
+def partition_dates(df):
+    """Local publication day of each article (fetch day when Published is unparsable)"""
+    published = pd.to_datetime(df["Published"], utc=True, errors='coerce', format='mixed')
+    days = published.dt.tz_convert(LOCAL_TZ).dt.date
+    today = datetime.now().date()
+    return days.where(published.notna(), today)
+
+
+def list_partitions(data_dir="data"):
+    """Archived days, oldest first"""
+    root = _archive_dir(data_dir)
+    if not os.path.isdir(root):
+        return []
+    days = []
+    for name in os.listdir(root):
+        if name.startswith("date="):
+            try:
+                days.append(date.fromisoformat(name[5:]))
+            except ValueError:
+                continue
+    return sorted(days)
+
+
+def _partition_path(data_dir, day):
+    return os.path.join(_archive_dir(data_dir), f"date={day.isoformat()}")
+
+
+def _parts(partition_path):
+    return sorted(
+        os.path.join(partition_path, name) for name in os.listdir(partition_path)
+        if name.startswith("part-") and not name.endswith(".tmp")
+    )
+
+
+def _encode_text(df, data_dir):
+    """Replace text columns with per-source dictionary-compressed bytes"""
+    columns = [c for c in COMPRESSED_COLUMNS if c in df]
+    if not columns or df.empty:
+        return df
+    df = df.copy()
+    dict_ids = pd.Series(text_codec.NO_DICT, index=df.index, dtype=object)
+    for source, group in df.groupby("Source", observed=True):
+        samples = [str(v).encode('utf-8') for c in columns for v in group[c].dropna()]
+        dict_ids[group.index] = text_codec.current_dict("text", source, samples, data_dir)
+    for column in columns:
+        df[column + COMPRESSED_SUFFIX] = [
+            None if pd.isna(value) else text_codec.compress_text(value, dict_id, data_dir)
+            for value, dict_id in zip(df[column], dict_ids)
+        ]
+    df[DICT_COLUMN] = dict_ids
+    return df.drop(columns=columns)
+
+
+def _decode_text(df, data_dir):
+    """Inverse of _encode_text for whichever compressed columns were read"""
+    for column in COMPRESSED_COLUMNS:
+        encoded = column + COMPRESSED_SUFFIX
+        if encoded not in df:
+            continue
+        decoded = pd.Series([
+            None if blob is None or (isinstance(blob, float) and pd.isna(blob))
+            else text_codec.decompress_text(blob, dict_id, data_dir)
+            for blob, dict_id in zip(df[encoded], df[DICT_COLUMN])
+        ], index=df.index, dtype=object)
+        # Parts written before compression keep the plain column
+        df[column] = decoded.fillna(df[column]) if column in df else decoded
+        df = df.drop(columns=[encoded])
+    return df.drop(columns=[DICT_COLUMN]) if DICT_COLUMN in df else df
+
+
+def _write_part(df, path, data_dir="data"):
+    tmp_path = f"{path}.tmp"
+    if path.endswith(".parquet"):
+        snapshot_format.write_parquet(_encode_text(df, data_dir), tmp_path)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def append_run(df, article_ids, version, data_dir="data"):
+    """Append the given (new or changed) articles of a run to their day partitions"""
+    rows = df[df["article_id"].isin(article_ids)]
+    if rows.empty:
+        return 0
+    days = partition_dates(rows)
+    for day, part in rows.groupby(days):
+        partition = _partition_path(data_dir, day)
+        os.makedirs(partition, exist_ok=True)
+        _write_part(part, os.path.join(partition, f"part-{version:06d}{_part_suffix()}"), data_dir)
+    logger.info(f"Archived {len(rows)} articles from version {version} into {days.nunique()} partitions")
+    return len(rows)
+
+
+def _read_partition(partition_path, columns=None, data_dir="data"):
+    """
+    All parts of one day, keeping only the latest copy of each article.
+    Compressed text is only read and decompressed when it is in columns.
+    """
+    wanted = None
+    if columns is not None:
+        wanted = columns + ["article_id"]
+        for column in COMPRESSED_COLUMNS:
+            if column in columns:
+                wanted += [column + COMPRESSED_SUFFIX, DICT_COLUMN]
+        wanted = list(dict.fromkeys(wanted))
+    frames = []
+    for part in _parts(partition_path):
+        try:
+            frames.append(snapshot_format.read_frame(part, wanted))
+        except FileNotFoundError:
+            # Replaced by a concurrent compaction; its rows are in the compacted part
+            continue
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(subset=["article_id"], keep="last")
+    merged = _decode_text(merged, data_dir)
+    return merged[[c for c in columns if c in merged]] if columns is not None else merged
+
+
+def query(start=None, end=None, columns=None, data_dir="data"):
+    """Archived articles published between start and end (inclusive dates)"""
+    frames = []
+    for day in list_partitions(data_dir):
+        if (start and day < start) or (end and day > end):
+            continue
+        frames.append(_read_partition(_partition_path(data_dir, day), columns, data_dir))
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _rewrite_partition(partition, parts, df, data_dir="data"):
+    """Replace a day's parts with a single part holding df"""
+    # Named after the newest replaced part so later runs still sort after it
+    newest = os.path.basename(parts[-1]).split(".")[0].replace("-compact", "")
+    target = os.path.join(partition, f"{newest}-compact{_part_suffix()}")
+    _write_part(df, target, data_dir)
+    for part in parts:
+        if part != target:
+            os.remove(part)
+
+
+def compact(data_dir="data", min_parts=2):
+    """Merge the per-run parts of each day into one part"""
+    compacted = 0
+    for day in list_partitions(data_dir):
+        partition = _partition_path(data_dir, day)
+        parts = _parts(partition)
+        if len(parts) < min_parts:
+            continue
+        _rewrite_partition(partition, parts, _read_partition(partition, data_dir=data_dir), data_dir)
+        compacted += 1
+    if compacted:
+        logger.info(f"Compacted {compacted} archive partitions")
+    return compacted
+
+
+def downsample(df):
+    """Keep the most significant articles of a day and drop bulky text"""
+    if "impact_score" in df and len(df) > DOWNSAMPLE_MAX_ROWS:
+        order = pd.to_numeric(df["impact_score"], errors='coerce').abs().sort_values(ascending=False)
+        df = df.loc[order.index[:DOWNSAMPLE_MAX_ROWS]]
+    return df.drop(columns=[c for c in DOWNSAMPLE_DROP_COLUMNS if c in df])
+
+
+def apply_retention(data_dir="data", today=None):
+    """Delete days past RETENTION_DAYS and downsample days past DOWNSAMPLE_AFTER_DAYS"""
+    today = today or datetime.now().date()
+    drop_before = today - timedelta(days=RETENTION_DAYS)
+    downsample_before = today - timedelta(days=DOWNSAMPLE_AFTER_DAYS)
+    dropped = downsampled = 0
+    for day in list_partitions(data_dir):
+        partition = _partition_path(data_dir, day)
+        if day < drop_before:
+            shutil.rmtree(partition, ignore_errors=True)
+            dropped += 1
+        elif day < downsample_before and not os.path.exists(os.path.join(partition, DOWNSAMPLED_MARKER)):
+            if not _parts(partition):
+                continue
+            _rewrite_partition(partition, _parts(partition),
+                               downsample(_read_partition(partition, data_dir=data_dir)), data_dir)
+            open(os.path.join(partition, DOWNSAMPLED_MARKER), 'w').close()
+            downsampled += 1
+    raw_root = os.path.join(_archive_dir(data_dir), "raw")
+    if os.path.isdir(raw_root):
+        for name in os.listdir(raw_root):
+            if name.startswith("date=") and name[5:] < drop_before.isoformat():
+                shutil.rmtree(os.path.join(raw_root, name), ignore_errors=True)
+    if dropped or downsampled:
+        logger.info(f"Archive retention: dropped {dropped} days, downsampled {downsampled} days")
+    return dropped, downsampled
+
+
+def maintain(data_dir="data"):
+    """Scheduled job: retention first, then compaction of what is left"""
+    try:
+        apply_retention(data_dir)
+        compact(data_dir)
+    except Exception as e:
+        logger.error(f"Archive maintenance failed: {e}")
+
+
+def _load_raw_hashes(state_path):
+    hashes = _raw_hashes.get(state_path)
+    if hashes is None:
+        try:
+            with open(state_path, 'r') as f:
+                hashes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            hashes = {}
+        _raw_hashes[state_path] = hashes
+    return hashes
+
+
+def store_raw_feed(source, payload, fetched_at=None, data_dir="data"):
+    """
+    Keep a fetched feed document, compressed with its source's dictionary.
+    Returns the stored path, or None when the payload is unchanged since the
+    source's last stored one.
+    """
+    state_path = os.path.join(_archive_dir(data_dir), "raw", RAW_STATE_NAME)
+    digest = hashlib.sha1(payload).hexdigest()
+    key = text_codec.slug(source)
+    with _raw_lock:
+        hashes = _load_raw_hashes(state_path)
+        if hashes.get(key) == digest:
+            return None
+
+    fetched_at = fetched_at or datetime.now()
+    dict_id = text_codec.current_dict("raw", source, [payload], data_dir)
+    partition = os.path.join(_archive_dir(data_dir), "raw", f"date={fetched_at.date().isoformat()}")
+    os.makedirs(partition, exist_ok=True)
+    name = f"{text_codec.slug(source)}-{fetched_at.strftime('%H%M%S%f')}.{dict_id}.z"
+    path = os.path.join(partition, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(text_codec.compress(payload, dict_id, data_dir))
+    os.replace(tmp_path, path)
+
+    with _raw_lock:
+        hashes[key] = digest
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(hashes, f)
+        os.replace(tmp_path, state_path)
+    return path
+
+
+def list_raw_feeds(day, source=None, data_dir="data"):
+    """Paths of the raw payloads archived on a day; read them with read_raw_feed"""
+    partition = os.path.join(_archive_dir(data_dir), "raw", f"date={day.isoformat()}")
+    if not os.path.isdir(partition):
+        return []
+    prefix = f"{text_codec.slug(source)}-" if source else ""
+    return sorted(
+        os.path.join(partition, name) for name in os.listdir(partition)
+        if name.endswith(".z") and name.startswith(prefix)
+    )
+
+
+def read_raw_feed(path, data_dir="data"):
+    """Decompressed bytes of one archived payload"""
+    dict_id = os.path.basename(path).split(".")[1]
+    with open(path, 'rb') as f:
+        return text_codec.decompress(f.read(), dict_id, data_dir)
@@ -0,0 +1,282 @@
+"""
+Change-data-capture stream of article mutations.
+
+Every run appends one event per inserted, updated or deleted article to
+data/cdc/events.jsonl. Events carry a monotonically increasing offset, the
+snapshot version and (for updates) the fields that changed, so consumers can
+resume from the last offset they processed instead of diffing snapshots.
+
+Each move of the live pointer (a publish or a rollback) has a sequence number.
+The last sequence written to the log is kept in data/cdc/sequence, and
+reconcile() fills in a move whose events were never written by diffing the
+generations on either side of it.
+"""
+
+import os
+import json
+import bisect
+import threading
+import logging
+import pandas as pd
+from datetime import datetime
+from app.services import data_store, snapshot_format, versioning
+
+logger = logging.getLogger(__name__)
+
+CDC_DIR = os.path.join("data", "cdc")
+EVENTS_NAME = "events.jsonl"
+# One line per run: first offset of the run and its byte position in the log
+INDEX_NAME = "events.idx"
+# Pointer sequence of the last move written to the log
+SEQUENCE_NAME = "sequence"
+
+DEFAULT_READ_LIMIT = 1000
+MAX_READ_LIMIT = 10000
+
+_lock = threading.Lock()
+# index path -> (file key, [(first offset, byte position)]), for readers
+_index_cache = {}
+
+
+def _paths(data_dir):
+    cdc_dir = os.path.join(data_dir, "cdc")
+    return os.path.join(cdc_dir, EVENTS_NAME), os.path.join(cdc_dir, INDEX_NAME)
+
+
+def _sequence_path(data_dir):
+    return os.path.join(data_dir, "cdc", SEQUENCE_NAME)
+
+
+def applied_sequence(data_dir="data"):
+    """Pointer sequence of the last move in the log (0 before the first)"""
+    try:
+        with open(_sequence_path(data_dir), 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        pass
+    # Logs written before the sequence file was kept: their versions were sequences
+    last = _last_event(_paths(data_dir)[0])
+    return int(last.get("sequence", last["version"])) if last else 0
+
+
+def _mark_applied(sequence, data_dir):
+    path = _sequence_path(data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(sequence))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _last_event(path):
+    """Last complete event of the log, reading backwards from the end"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0:
+            step = min(8192, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            lines = data.split(b"\n")
+            if position:
+                # The first piece may start mid-line; keep it for the next block
+                lines = lines[1:]
+            for line in reversed([line for line in lines if line.strip()]):
+                try:
+                    return json.loads(line)
+                except ValueError:
+                    # Torn write at the end of the log
+                    continue
+    return None
+
+
+def _text(df):
+    # Same text form as versioning.row_hashes, so "changed" agrees with the diff
+    return df.set_index("article_id").astype(str)
+
+
+def build_events(previous, current, changes):
+    """Events for one run's changes, in insert, update, delete order"""
+    events = []
+    if changes["inserted"]:
+        for record in data_store.frame_records(current[current["article_id"].isin(changes["inserted"])]):
+            events.append({"op": "insert", "article_id": record["article_id"], "data": record})
+
+    if changes["updated"]:
+        old = _text(previous[previous["article_id"].isin(changes["updated"])])
+        new_rows = current[current["article_id"].isin(changes["updated"])]
+        new = _text(new_rows)
+        columns = [c for c in new.columns if c in old.columns]
+        added = [c for c in new.columns if c not in old.columns]
+        records = {r["article_id"]: r for r in data_store.frame_records(new_rows)}
+        for aid in new.index:
+            before, after = old.loc[aid], new.loc[aid]
+            changed = [c for c in columns if before[c] != after[c]] + added
+            events.append({
+                "op": "update",
+                "article_id": aid,
+                "changed": changed,
+                "data": {c: records[aid].get(c) for c in changed},
+            })
+
+    for aid in changes["removed"]:
+        events.append({"op": "delete", "article_id": aid})
+    return events
+
+
+def append_run(previous, current, changes, version, sequence, data_dir="data"):
+    """
+    Append the events of one pointer move to the log (fsynced). A sequence
+    that is already in the log is not appended again. Returns the number of
+    events written.
+    """
+    path, index_path = _paths(data_dir)
+    with _lock:
+        if applied_sequence(data_dir) >= sequence:
+            return 0
+        last = _last_event(path)
+        events = build_events(previous, current, changes)
+        if not events:
+            _mark_applied(sequence, data_dir)
+            return 0
+
+        next_offset = last["offset"] + 1 if last else 0
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        lines = []
+        for i, event in enumerate(events):
+            lines.append(json.dumps({"offset": next_offset + i, "version": version, "sequence": sequence,
+                                     "ts": timestamp, **event}, default=str) + "\n")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            position = f.tell()
+            if position and not _ends_with_newline(path):
+                # Terminate a torn last line so it is skipped by readers
+                f.write(b"\n")
+                position += 1
+            f.write("".join(lines).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        # The index only speeds up seeks; readers scan past unindexed runs
+        with open(index_path, 'a') as f:
+            f.write(f"{next_offset} {position}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _mark_applied(sequence, data_dir)
+
+    logger.info(f"CDC: appended {len(events)} events for version {version} (offsets {next_offset}+)")
+    return len(events)
+
+
+def _generation_frame(version, data_dir):
+    """A retained generation's articles (none for version 0)"""
+    if not version:
+        return pd.DataFrame(columns=["article_id"])
+    generation_dir = os.path.join(data_dir, "snapshots", versioning.generation_name(version))
+    names = [snapshot_format.CSV_NAME]
+    if snapshot_format.available():
+        names.insert(0, snapshot_format.PARQUET_NAME)
+    for name in names:
+        path = os.path.join(generation_dir, name)
+        if os.path.exists(path):
+            return data_store.load_frame(path)
+    raise FileNotFoundError(f"Generation {version} is no longer retained")
+
+
+def reconcile(data_dir="data"):
+    """
+    Write the events of the live pointer's last move if the log does not have
+    them yet: a run that failed after its pointer flip, or a rollback.
+    Returns the number of events written.
+    """
+    pointer = versioning.read_current(os.path.join(data_dir, "current.json"))
+    sequence = versioning.pointer_sequence(pointer)
+    applied = applied_sequence(data_dir)
+    if applied >= sequence:
+        return 0
+    if "previous_version" not in pointer:
+        # Written before moves were tracked; nothing to diff against
+        _mark_applied(sequence, data_dir)
+        return 0
+    if applied < sequence - 1:
+        logger.warning(f"CDC: moves {applied + 1}-{sequence - 1} are missing from the log; "
+                       f"only the last one can be rebuilt")
+    version = int(pointer["version"])
+    try:
+        previous = _generation_frame(int(pointer["previous_version"]), data_dir)
+        current = _generation_frame(version, data_dir)
+    except FileNotFoundError as e:
+        logger.error(f"CDC: cannot rebuild events for version {version}: {e}")
+        _mark_applied(sequence, data_dir)
+        return 0
+    written = append_run(previous, current, versioning.diff_frames(previous, current), version, sequence, data_dir)
+    logger.info(f"CDC: reconciled move {sequence} to version {version}")
+    return written
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _load_index(index_path):
+    try:
+        st = os.stat(index_path)
+    except FileNotFoundError:
+        return []
+    key = (index_path, st.st_mtime_ns, st.st_size)
+    cached = _index_cache.get(index_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    entries = []
+    with open(index_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                entries.append((int(parts[0]), int(parts[1])))
+    entries.sort()
+    _index_cache[index_path] = (key, entries)
+    return entries
+
+
+def read_events(after=-1, limit=DEFAULT_READ_LIMIT, data_dir="data"):
+    """
+    Events with offset > after, oldest first, at most limit of them.
+    Returns (events, latest offset in the log or -1).
+    """
+    path, index_path = _paths(data_dir)
+    last = _last_event(path)
+    latest = last["offset"] if last else -1
+    if latest <= after:
+        return [], latest
+
+    index = _load_index(index_path)
+    firsts = [first for first, _ in index]
+    i = bisect.bisect_right(firsts, after + 1) - 1
+    position = index[i][1] if i >= 0 else 0
+
+    events = []
+    with open(path, 'rb') as f:
+        f.seek(position)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event["offset"] <= after:
+                continue
+            events.append(event)
+            if len(events) >= limit:
+                break
+    return events, latest
@@ -0,0 +1,204 @@
+"""
+Per-stage checkpoints for pipeline runs.
+
+Each run gets a directory data/runs/<run_id>/ holding the output of every
+completed stage (frames as Parquet, or pickle without pyarrow; embeddings as
+.npy) and a manifest.json. A run that fails or is interrupted is resumed by
+the next pipeline run from its last completed stage, as long as it is recent
+enough that its fetched articles are still worth publishing and has not
+already failed on resume too often.
+"""
+
+import os
+import json
+import shutil
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from app.services import snapshot_format
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+# Unfinished runs older than this are abandoned instead of resumed
+RESUME_MAX_AGE = timedelta(hours=6)
+# A run that keeps failing after this many resumes is abandoned, so fresh feeds get fetched
+MAX_RESUME_ATTEMPTS = 2
+# Completed (and abandoned) runs kept on disk for inspection
+KEEP_RUNS = 3
+
+
+def _write_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class PipelineRun:
+    """One pipeline run and the stage outputs it has checkpointed"""
+
+    def __init__(self, run_dir, manifest):
+        self.run_dir = run_dir
+        self.manifest = manifest
+
+    @property
+    def run_id(self):
+        return self.manifest["run_id"]
+
+    def _save_manifest(self):
+        _write_manifest(os.path.join(self.run_dir, MANIFEST_NAME), self.manifest)
+
+    def has(self, stage):
+        return stage in self.manifest["stages"]
+
+    def _stage_path(self, stage, kind):
+        if kind == "array":
+            return os.path.join(self.run_dir, f"{stage}.npy")
+        suffix = ".parquet" if snapshot_format.available() else ".pkl"
+        return os.path.join(self.run_dir, f"{stage}{suffix}")
+
+    def _save(self, stage, value, kind):
+        path = self._stage_path(stage, kind)
+        # Write under a temp name so a crash never leaves a half-written stage
+        tmp_path = f"{path}.tmp"
+        if kind == "array":
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(value))
+        elif path.endswith(".parquet"):
+            snapshot_format.write_parquet(value, tmp_path)
+        else:
+            value.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        self.manifest["stages"][stage] = os.path.basename(path)
+        self._save_manifest()
+
+    def _load(self, stage, kind):
+        path = os.path.join(self.run_dir, self.manifest["stages"][stage])
+        if kind == "array":
+            return np.load(path)
+        if path.endswith(".parquet"):
+            return snapshot_format.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def stage(self, stage, compute, kind="frame"):
+        """
+        Output of a stage: loaded from its checkpoint when this run already
+        completed it, otherwise computed and checkpointed. None is not saved.
+        """
+        if self.has(stage):
+            logger.info(f"Run {self.run_id}: resuming from checkpoint '{stage}'")
+            return self._load(stage, kind)
+        value = compute()
+        if value is not None:
+            self._save(stage, value, kind)
+        return value
+
+    def _finish(self, status, **fields):
+        self.manifest.update(status=status, finished_at=datetime.now().isoformat(timespec='seconds'), **fields)
+        self._save_manifest()
+
+    def complete(self, version=None):
+        self._finish("completed", version=version)
+
+    def fail(self, error):
+        self._finish("failed", error=str(error))
+        logger.error(f"Run {self.run_id} failed after stages {list(self.manifest['stages'])}: {error}")
+
+
+def _runs_dir(data_dir):
+    return os.path.join(data_dir, "runs")
+
+
+def _load_manifest(run_dir):
+    try:
+        with open(os.path.join(run_dir, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def list_runs(data_dir="data"):
+    """(run_dir, manifest) of every run, oldest first"""
+    root = _runs_dir(data_dir)
+    if not os.path.isdir(root):
+        return []
+    runs = []
+    for name in sorted(os.listdir(root)):
+        run_dir = os.path.join(root, name)
+        manifest = _load_manifest(run_dir)
+        if manifest is not None:
+            runs.append((run_dir, manifest))
+    return runs
+
+
+def _owner_alive(manifest):
+    """Whether the process that last ran this run is still running"""
+    pid = manifest.get("pid")
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def resume_or_start(data_dir="data", now=None):
+    """
+    The most recent failed or crashed run with checkpoints to reuse, or a new
+    run. A run still in progress in a live process is never taken over.
+    """
+    now = now or datetime.now()
+    for run_dir, manifest in reversed(list_runs(data_dir)):
+        if manifest.get("status") == "completed":
+            break
+        if manifest.get("status") == "running" and _owner_alive(manifest):
+            logger.warning(f"Pipeline run {manifest['run_id']} is still in progress (pid {manifest['pid']}); "
+                           f"starting a separate run")
+            break
+        started = datetime.fromisoformat(manifest["started_at"])
+        if not manifest["stages"] or now - started > RESUME_MAX_AGE:
+            break
+        attempts = manifest.get("resume_attempts", 0)
+        if attempts >= MAX_RESUME_ATTEMPTS:
+            logger.warning(f"Abandoning pipeline run {manifest['run_id']} after {attempts} failed resumes")
+            manifest["status"] = "abandoned"
+            _write_manifest(os.path.join(run_dir, MANIFEST_NAME), manifest)
+            break
+        logger.info(f"Resuming pipeline run {manifest['run_id']} ({manifest.get('status')})")
+        manifest["status"] = "running"
+        manifest["pid"] = os.getpid()
+        manifest["resumed_at"] = now.isoformat(timespec='seconds')
+        manifest["resume_attempts"] = attempts + 1
+        run = PipelineRun(run_dir, manifest)
+        run._save_manifest()
+        return run
+
+    run_id = now.strftime("%Y%m%dT%H%M%S%f")
+    run_dir = os.path.join(_runs_dir(data_dir), run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    run = PipelineRun(run_dir, {
+        "run_id": run_id,
+        "started_at": now.isoformat(timespec='seconds'),
+        "status": "running",
+        "pid": os.getpid(),
+        "stages": {},
+    })
+    run._save_manifest()
+    prune_runs(data_dir, keep_run=run_id)
+    return run
+
+
+def prune_runs(data_dir="data", keep=KEEP_RUNS, keep_run=None):
+    """Delete all but the newest `keep` finished runs (never one in progress)"""
+    finished = [(d, m) for d, m in list_runs(data_dir)
+                if m["run_id"] != keep_run and not (m.get("status") == "running" and _owner_alive(m))]
+    for run_dir, _ in finished[:-keep] if keep else finished:
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -1,4 +1,5 @@
 import feedparser
+import requests
 import pandas as pd
 import re
 import nltk
@@ -10,6 +11,7 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 import os
 import logging
+from app.services import data_store, events, versioning, snapshot_format, shared_snapshot, archive, search_index, rollups, cdc, checkpoints, nlp_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -611,6 +613,9 @@ except LookupError:
 STOP_WORDS = set(stopwords.words("english"))
 SIA = SentimentIntensityAnalyzer()
 
+# Columnar Parquet is the primary snapshot format; CSV copies are optional
+WRITE_CSV = os.environ.get("SIGNALS_WRITE_CSV", "1") == "1"
+
 # Global model variable
 MODEL = None
 CURRENT_MODEL_NAME = "all-MiniLM-L6-v2"
@@ -714,15 +719,18 @@ def tag_ops(text):
                 break
     return ", ".join(tags) if tags else "general"
 
-def run_pipeline(data_dir="data"):
-    logger.info("Starting pipeline execution...")
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-
+def fetch_articles(data_dir="data"):
+    """Fetch every feed into a deduplicated frame keyed by article_id, or None"""
     rows = []
     for source, url in RSS_FEEDS.items():
         try:
-            feed = feedparser.parse(url)
+            response = requests.get(url, headers={"User-Agent": feedparser.USER_AGENT}, timeout=30)
+            response.raise_for_status()
+            feed = feedparser.parse(response.content)
+            try:
+                archive.store_raw_feed(source, response.content, data_dir=data_dir)
+            except Exception as err:
+                logger.warning(f"Could not archive raw feed for {source}: {err}")
             for e in feed.entries[:50]:
                 rows.append([
                     source,
@@ -736,30 +744,38 @@ def run_pipeline(data_dir="data"):
             logger.error(f"Error fetching {source}: {err}")
 
     if not rows:
-        logger.warning("No data fetched.")
-        return
+        return None
 
     df = pd.DataFrame(rows, columns=["Source", "Title", "Link", "Summary", "Published", "SEO_Score"])
     df = df.drop_duplicates(subset=["Title", "Link"])
-    
-    # Cleaning
+    df.insert(0, "article_id", versioning.article_ids(df))
+    return df.drop_duplicates(subset=["article_id"])
+
+def clean_articles(df):
+    df = df.copy()
     df["Summary"] = df["Summary"].astype(str).apply(strip_html)
     df["Title"] = df["Title"].astype(str).apply(strip_html)
     df["cleaned"] = (df["Title"] + " " + df["Summary"]).apply(clean_text)
-    df = df.drop_duplicates(subset=["Source", "cleaned"])
-
-    # Clustering
-    if not df.empty:
-        model = get_model()
-        emb = model.encode(df["cleaned"].tolist(), show_progress_bar=False)
-        n_clusters = min(6, len(df))
-        if n_clusters > 1:
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
-            df["topic_cluster"] = kmeans.fit_predict(emb)
-        else:
-            df["topic_cluster"] = 0
+    return df.drop_duplicates(subset=["Source", "cleaned"]).reset_index(drop=True)
+
+def embed_articles(df):
+    if df.empty:
+        return np.zeros((0, 0), dtype=np.float32)
+    model = get_model()
+    return model.encode(df["cleaned"].tolist(), show_progress_bar=False)
+
+def cluster_articles(df, emb):
+    df = df.copy()
+    n_clusters = min(6, len(df))
+    if n_clusters > 1:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
+        df["topic_cluster"] = kmeans.fit_predict(emb)
     else:
         df["topic_cluster"] = 0
+    return df
+
+def score_articles(df):
+    df = df.copy()
 
     # Sentiment & Impact
     df["sentiment_score"] = df["cleaned"].apply(lambda x: SIA.polarity_scores(x)["compound"])
@@ -794,7 +810,9 @@ def run_pipeline(data_dir="data"):
             return "Normal"
 
     df["event_flag"] = df["topic_cluster"].apply(detect_event)
+    return df
 
+def name_clusters(df):
     # Automated Cluster Naming
     try:
         def generate_cluster_names(df):
@@ -829,8 +847,134 @@ def run_pipeline(data_dir="data"):
         logger.error(f"Error generating cluster names: {e}")
         df["cluster_name"] = "Cluster " + df["topic_cluster"].astype(str)
 
-    # Save final result
-    output_path = os.path.join(data_dir, "final_data.csv")
-    df.to_csv(output_path, index=False)
-    logger.info(f"Pipeline completed. Data saved to {output_path}")
+    return df
+
+def locate_articles(df, data_dir="data"):
+    """Matched known locations per article, written to the 'locations' column"""
+    df = df.copy()
+    try:
+        matches = nlp_service.article_locations(df, os.path.join(data_dir, "locations.db"))
+        df["locations"] = [nlp_service.join_locations(m) for m in matches]
+    except Exception as e:
+        logger.error(f"Error extracting locations: {e}")
+        df["locations"] = ""
+    return df
+
+def run_pipeline(data_dir="data"):
+    logger.info("Starting pipeline execution...")
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    # Overlapping runs (scheduled, startup, manual refresh) wait for each other
+    with versioning.file_lock(versioning.PIPELINE_LOCK, data_dir):
+        return _run_pipeline(data_dir)
+
+def _run_pipeline(data_dir):
+    # Each stage is checkpointed so a failed run resumes where it stopped
+    run = checkpoints.resume_or_start(data_dir)
+    try:
+        df = run.stage("fetched", lambda: fetch_articles(data_dir))
+        if df is None:
+            logger.warning("No data fetched.")
+            run.fail("No data fetched")
+            events.publish("pipeline_failed", {"error": "No data fetched"})
+            return
+
+        df = run.stage("cleaned", lambda: clean_articles(df))
+        emb = run.stage("embeddings", lambda: embed_articles(df), kind="array")
+        df = run.stage("clusters", lambda: cluster_articles(df, emb))
+        df = run.stage("scores", lambda: score_articles(df))
+        df = run.stage("locations", lambda: locate_articles(df, data_dir))
+        df = name_clusters(df)
+        version, output_path = publish_run(df, data_dir)
+    except Exception as e:
+        run.fail(e)
+        events.publish("pipeline_failed", {"error": str(e)})
+        raise
+    run.complete(version)
     return output_path
+
+def publish_run(df, data_dir):
+    """Publish the result as a new versioned snapshot and feed the derived stores"""
+    # Held until the derived stores are fed, so a rollback cannot land in between
+    with versioning.file_lock(versioning.PUBLISH_LOCK, data_dir):
+        return _publish_run(df, data_dir)
+
+def _publish_run(df, data_dir):
+    try:
+        # Events of a move whose stream write failed, so this run's diff follows on from them
+        cdc.reconcile(data_dir)
+    except Exception as e:
+        logger.error(f"Error reconciling change stream: {e}")
+    previous = load_previous_run(data_dir)
+    stats = data_store.build_stats(df)
+    files = {"stats.json": lambda path: data_store.save_stats(stats, path)}
+    if snapshot_format.available():
+        files[snapshot_format.PARQUET_NAME] = lambda path: snapshot_format.write_parquet(df, path)
+    if WRITE_CSV or not snapshot_format.available():
+        files[snapshot_format.CSV_NAME] = lambda path: df.to_csv(path, index=False)
+    version, changes = versioning.publish_snapshot(previous, df, files, data_dir)
+    if shared_snapshot.enabled():
+        shared_snapshot.publish_frame(df, version)
+    try:
+        sequence = versioning.pointer_sequence(versioning.read_current(os.path.join(data_dir, "current.json")))
+        cdc.append_run(previous, df, changes, version, sequence, data_dir)
+    except Exception as e:
+        logger.error(f"Error writing change stream for version {version}: {e}")
+    try:
+        archive.append_run(df, changes["inserted"] + changes["updated"], version, data_dir)
+    except Exception as e:
+        logger.error(f"Error archiving version {version}: {e}")
+    try:
+        search_index.upsert(df, changes["inserted"] + changes["updated"],
+                            os.path.join(data_dir, "search.db"))
+    except Exception as e:
+        logger.error(f"Error updating search index for version {version}: {e}")
+    try:
+        rollups.apply_run(df, changes["inserted"], version, os.path.join(data_dir, "trends.db"))
+    except Exception as e:
+        logger.error(f"Error updating trends for version {version}: {e}")
+
+    # Keep the flat copy for tools that read final_data.csv directly
+    if WRITE_CSV:
+        flat_path = os.path.join(data_dir, snapshot_format.CSV_NAME)
+        versioning.write_atomic(flat_path, lambda path: df.to_csv(path, index=False))
+
+    data_store.publish_version()
+    publish_run_events(df, changes, version, stats)
+    output_path = data_store.data_path(data_dir)
+    logger.info(f"Pipeline completed. Version {version} published to {output_path}")
+    return version, output_path
+
+def load_previous_run(data_dir):
+    """The live published run, used to work out what changed"""
+    path = data_store.data_path(data_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["article_id"])
+    try:
+        return data_store.load_frame(path)
+    except Exception as e:
+        logger.warning(f"Could not read previous run for comparison: {e}")
+        return pd.DataFrame(columns=["article_id"])
+
+def publish_run_events(df, changes, version, stats):
+    """Notify dashboard streams that a run committed and which high-risk articles are new"""
+    new_high_risk = df[(df["impact_level"] == "High Risk") & df["article_id"].isin(changes["inserted"])]
+    for _, row in new_high_risk.iterrows():
+        events.publish("high_risk_article", {
+            "Title": row["Title"],
+            "Source": row["Source"],
+            "Link": row["Link"],
+            "article_id": row["article_id"],
+            "impact_level": row["impact_level"],
+            "version": version
+        })
+    events.publish("pipeline_finished", {
+        "version": version,
+        "total_articles": stats["total_articles"],
+        "inserted": len(changes["inserted"]),
+        "updated": len(changes["updated"]),
+        "removed": len(changes["removed"]),
+        "new_high_risk": len(new_high_risk),
+        "last_updated": stats["last_updated"]
+    })
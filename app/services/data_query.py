@@ -0,0 +1,147 @@
+"""
+Server-side filtering, pagination and field projection for /api/data.
+Each snapshot gets a set of positional indexes built once, so a query only
+touches the rows it returns.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Query parameter -> column of the processed frame
+INDEXED_FIELDS = {
+    "impact_level": "impact_level",
+    "event_flag": "event_flag",
+    "operational_tag": "operational_tag",
+    "source": "Source",
+    "cluster": "topic_cluster",
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+class SnapshotIndex:
+    """Value -> sorted row positions for the filterable columns, plus a time index"""
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.values = {}
+        for param, column in INDEXED_FIELDS.items():
+            if column not in df:
+                self.values[param] = {}
+            elif param == "operational_tag":
+                # Rows carry several comma-separated tags; index each one
+                tags = df[column].astype(str).str.split(', ').explode()
+                self.values[param] = _group_positions(tags)
+            else:
+                self.values[param] = _group_positions(df[column].astype(str))
+
+        if "Published" in df:
+            published = pd.to_datetime(df["Published"], utc=True, errors='coerce', format='mixed')
+            ts = published.to_numpy(dtype='datetime64[ns]').astype('int64')
+            valid = ~published.isna().to_numpy()
+        else:
+            ts = np.zeros(self.size, dtype='int64')
+            valid = np.zeros(self.size, dtype=bool)
+        positions = np.flatnonzero(valid)
+        order = np.argsort(ts[positions], kind='stable')
+        self.time_positions = positions[order]
+        self.time_values = ts[positions][order]
+
+    def lookup(self, param, wanted):
+        """Positions matching any of the wanted values for one parameter"""
+        index = self.values.get(param, {})
+        hits = [index[v] for v in wanted if v in index]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(hits)) if len(hits) > 1 else hits[0]
+
+    def time_range(self, since=None, until=None):
+        lo = 0 if since is None else np.searchsorted(self.time_values, since, side='left')
+        hi = len(self.time_values) if until is None else np.searchsorted(self.time_values, until, side='right')
+        return np.sort(self.time_positions[lo:hi])
+
+
+def _group_positions(series):
+    """Map each distinct value to the sorted row positions holding it (index = position)"""
+    positions = series.index.to_numpy(dtype=np.int64)
+    groups = pd.Series(positions).groupby(series.to_numpy()).indices
+    return {str(value): np.unique(positions[idx]) for value, idx in groups.items()}
+
+
+def _build_index(snapshot):
+    return SnapshotIndex(snapshot.df.reset_index(drop=True))
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    ts = pd.to_datetime(value, utc=True, errors='coerce')
+    if pd.isna(ts):
+        raise ValueError(f"Invalid timestamp: {value}")
+    return ts.value
+
+
+def _parse_int(value, name, default, minimum=1, maximum=None):
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum:
+        raise ValueError(f"{name} must be >= {minimum}")
+    return min(number, maximum) if maximum else number
+
+
+def has_query(args):
+    """True if the request asks for anything other than the full dataset"""
+    keys = set(INDEXED_FIELDS) | {"page", "limit", "fields", "since", "until"}
+    return any(args.get(k) for k in keys)
+
+
+def query_records(snapshot, args):
+    """
+    Apply filters, pagination and projection from request args.
+
+    Filters accept comma-separated values (OR within a parameter, AND across
+    parameters). Returns (records, total, page, limit); limit is None when
+    the caller did not paginate.
+    """
+    index = snapshot.memo('query_index', _build_index)
+    positions = None
+
+    for param in INDEXED_FIELDS:
+        raw = args.get(param)
+        if not raw:
+            continue
+        wanted = [v.strip() for v in raw.split(',') if v.strip()]
+        hits = index.lookup(param, wanted)
+        positions = hits if positions is None else np.intersect1d(positions, hits, assume_unique=True)
+
+    since = _parse_time(args.get("since"))
+    until = _parse_time(args.get("until"))
+    if since is not None or until is not None:
+        hits = index.time_range(since, until)
+        positions = hits if positions is None else np.intersect1d(positions, hits, assume_unique=True)
+
+    total = index.size if positions is None else len(positions)
+
+    paginate = bool(args.get("page") or args.get("limit"))
+    page = _parse_int(args.get("page"), "page", 1)
+    limit = _parse_int(args.get("limit"), "limit", DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE) if paginate else None
+
+    if limit is not None:
+        start = (page - 1) * limit
+        if positions is None:
+            selected = range(start, min(start + limit, total))
+        else:
+            selected = positions[start:start + limit]
+    else:
+        selected = range(total) if positions is None else positions
+
+    # Only the selected rows and fields are converted to Python objects
+    fields = [f.strip() for f in args.get("fields", "").split(',') if f.strip()]
+    positions = None if isinstance(selected, range) and len(selected) == index.size else selected
+    rows = snapshot.rows(positions, fields or None)
+    return rows, total, page, limit
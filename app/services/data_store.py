@@ -0,0 +1,325 @@
+"""
+Shared read model for the processed news snapshot.
+Loads the live generation (Parquet, or CSV for older runs) once per process and
+serves it to every API route until the pipeline publishes (or rolls back to)
+another version.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services import versioning, snapshot_format, shared_snapshot
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Flat files used before versioned snapshots existed
+DATA_FILE = os.path.join("data", "final_data.csv")
+STATS_FILE = os.path.join("data", "stats.json")
+
+# Current in-memory snapshot and the lock that serialises reloads
+_snapshot = None
+_reload_lock = threading.Lock()
+
+# Bumped by the pipeline after each successful write
+_published_version = 0
+
+# (file key or snapshot version, body bytes, etag) of the last stats document served
+_stats_cache = None
+
+
+class Snapshot:
+    """Immutable view of one loaded version of the processed data"""
+
+    def __init__(self, df, key, version, table=None, shared_bodies=None):
+        self._df = df
+        self.key = key
+        self.version = version
+        # Set for snapshots mapped from shared memory
+        self.table = table
+        self.shared_bodies = shared_bodies or {}
+        self._derived = {}
+        self._derived_locks = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def df(self):
+        if self._df is None:
+            # Arrow-backed columns keep pointing into the shared mapping
+            self._df = self.memo('df', lambda snap: snap.table.to_pandas(types_mapper=pd.ArrowDtype))
+        return self._df
+
+    @property
+    def etag(self):
+        """Validator shared by every process serving the same data file"""
+        file_key = self.key[0]
+        if file_key is None:
+            return "empty"
+        return f"{self.version}-{file_key[0]:x}-{file_key[1]:x}"
+
+    def memo(self, name, builder):
+        """
+        Build a derived artifact (records, indexes, encoded bodies...) at most
+        once per snapshot. builder receives the snapshot. Each artifact has its
+        own lock so a slow build does not hold up unrelated ones.
+        """
+        if name in self._derived:
+            return self._derived[name]
+        with self._locks_lock:
+            lock = self._derived_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+        return self._derived[name]
+
+    def records(self):
+        """
+        All rows as JSON-ready dicts (NaN replaced with None). Not kept: callers
+        cache the encoded body instead, so workers do not hold a copy of the
+        corpus as Python objects.
+        """
+        return self.rows()
+
+    def rows(self, positions=None, fields=None):
+        """
+        JSON-ready dicts for the given row positions (all rows if None), with
+        only the requested fields. Only the selected cells are converted; for
+        shared snapshots they are taken straight from the mapped Arrow table.
+        """
+        if self.table is not None:
+            table = self.table
+            if fields:
+                table = table.select([f for f in fields if f in table.column_names])
+            if positions is not None:
+                table = table.take(pa.array(np.asarray(positions, dtype=np.int64)))
+            df = table.to_pandas()
+        else:
+            df = self.df
+            if fields:
+                df = df[[f for f in fields if f in df.columns]]
+            if positions is not None:
+                df = df.iloc[np.asarray(positions, dtype=np.int64)]
+        records = frame_records(df)
+        if fields:
+            # Unknown fields are returned as null, in the order asked for
+            records = [{f: record.get(f) for f in fields} for record in records]
+        return records
+
+    def records_by_id(self, article_ids):
+        """Records for the given article IDs, skipping unknown ones"""
+        positions = self.memo('id_positions', _build_id_positions)
+        return self.rows([positions[aid] for aid in article_ids if aid in positions])
+
+
+def frame_records(df):
+    """JSON-ready rows of a frame, as served by /api/data"""
+    float32 = [c for c in df.columns if df[c].dtype == "float32"]
+    if float32:
+        # Avoid float32 rounding noise (0.4939 -> 0.49390000104904175) in JSON
+        df = df.astype({c: "float64" for c in float32}).round({c: 6 for c in float32})
+    return df.astype(object).where(pd.notnull(df), None).to_dict(orient='records')
+
+
+def _build_id_positions(snapshot):
+    if snapshot.table is not None:
+        if "article_id" not in snapshot.table.column_names:
+            return {}
+        ids = snapshot.table.column("article_id").to_pylist()
+    elif "article_id" in snapshot.df:
+        ids = snapshot.df["article_id"]
+    else:
+        return {}
+    return {aid: i for i, aid in enumerate(ids)}
+
+
+def _file_key(path):
+    """Cheap change detector for the data file: (mtime_ns, size) or None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def data_path(data_dir="data"):
+    """
+    Data file of the live generation (Parquet preferred when pyarrow is
+    installed), or the legacy flat CSV before the first versioned run.
+    """
+    if snapshot_format.available():
+        parquet = versioning.current_file(snapshot_format.PARQUET_NAME, data_dir)
+        if parquet and os.path.exists(parquet):
+            return parquet
+    csv = versioning.current_file(snapshot_format.CSV_NAME, data_dir)
+    if csv and os.path.exists(csv):
+        return csv
+    return os.path.join(data_dir, snapshot_format.CSV_NAME)
+
+
+def stats_path():
+    return versioning.current_file("stats.json") or STATS_FILE
+
+
+def _current_key():
+    shared_key = shared_snapshot.pointer_key()
+    if shared_key is not None:
+        return (shared_key, "shm", None, _published_version)
+    path = data_path()
+    return (_file_key(path), path, versioning.current_version(), _published_version)
+
+
+def publish_version():
+    """Signal that the pipeline has written a new snapshot"""
+    global _published_version
+    with _reload_lock:
+        _published_version += 1
+        return _published_version
+
+
+def get_snapshot():
+    """
+    Return the current snapshot, reloading it only when the data file or the
+    published version has changed. Concurrent callers share a single reload.
+    """
+    global _snapshot
+    key = _current_key()
+    snap = _snapshot
+    if snap is not None and snap.key == key:
+        return snap
+
+    with _reload_lock:
+        # Another request may have reloaded while we waited for the lock
+        key = _current_key()
+        snap = _snapshot
+        if snap is not None and snap.key == key:
+            return snap
+
+        if key[1] == "shm":
+            shared = shared_snapshot.open_current()
+            _snapshot = Snapshot(None, key, shared.version, table=shared.table, shared_bodies=shared.bodies)
+            return _snapshot
+
+        version = key[2]
+        if key[0] is None:
+            df = pd.DataFrame()
+        else:
+            df = snapshot_format.compact_frame(load_frame(key[1]))
+            logger.info(f"Loaded {len(df)} articles into read model (version {version})")
+
+        _snapshot = Snapshot(df, key, version)
+        return _snapshot
+
+
+def load_frame(path, columns=None):
+    """Read a snapshot file from disk, adding article IDs to pre-versioning data"""
+    wanted = columns
+    if columns is not None and "article_id" in columns:
+        # Older files derive the ID from these
+        wanted = list(dict.fromkeys(columns + ["Source", "Link", "Title"]))
+    df = snapshot_format.read_frame(path, wanted)
+    if "article_id" not in df and (columns is None or "article_id" in columns):
+        df.insert(0, "article_id", versioning.article_ids(df))
+    return df[columns] if columns is not None else df
+
+
+def load_columns(columns, data_dir="data"):
+    """
+    Only the given columns of the live snapshot, read straight from disk.
+    For Parquet snapshots only the pages of those columns are read and decoded.
+    """
+    path = data_path(data_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    return load_frame(path, columns)
+
+
+def get_dataframe():
+    """Shortcut for routes that only need the DataFrame (treat as read-only)"""
+    return get_snapshot().df
+
+
+def has_data():
+    return _file_key(data_path()) is not None
+
+
+def last_modified():
+    """Modification time of the live data file as a UNIX timestamp, or None"""
+    key = _file_key(data_path())
+    return key[0] / 1e9 if key else None
+
+
+def _count(series):
+    # Categorical columns also report unused categories; skip those
+    return {str(k): int(v) for k, v in series.value_counts().items() if v > 0}
+
+
+def build_stats(df, generated_at=None):
+    """Summarise a processed frame into the small document served by /api/stats"""
+    generated_at = generated_at or time.time()
+    if df.empty:
+        tags = {}
+    else:
+        tags = _count(df['operational_tag'].astype(str).str.split(', ').explode())
+    impact = _count(df['impact_level']) if 'impact_level' in df else {}
+    events = _count(df['event_flag']) if 'event_flag' in df else {}
+    return {
+        "total_articles": int(len(df)),
+        "high_risk": impact.get("High Risk", 0),
+        "opportunity": impact.get("Opportunity", 0),
+        "major_events": events.get("Major Event", 0),
+        "last_updated": time.ctime(generated_at),
+        "generated_at": datetime.fromtimestamp(generated_at).isoformat(timespec='seconds'),
+        "impact_level": impact,
+        "event_flag": events,
+        "operational_tag": tags,
+        "source": _count(df['Source']) if 'Source' in df else {},
+    }
+
+
+def save_stats(stats, path):
+    """Write a stats document next to the data it describes"""
+    with open(path, 'w') as f:
+        json.dump(stats, f)
+
+
+def _encode_stats(stats):
+    body = json.dumps(stats).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def get_stats_document():
+    """
+    Return (body, etag) for /api/stats, or (None, None) when there is no data.
+    Reads the precomputed stats file; falls back to summarising the snapshot
+    for data written before the pipeline produced stats.
+    """
+    global _stats_cache
+    path = stats_path()
+    stats_key = _file_key(path)
+    cache_key = ('file', path, stats_key) if stats_key else ('snapshot', _current_key())
+    cached = _stats_cache
+    if cached is not None and cached[0] == cache_key:
+        return cached[1], cached[2]
+
+    if stats_key is not None:
+        with open(path, 'rb') as f:
+            body = f.read()
+        etag = hashlib.sha1(body).hexdigest()
+    elif has_data():
+        df = load_columns(["impact_level", "event_flag", "operational_tag", "Source"])
+        body, etag = _encode_stats(build_stats(df, last_modified()))
+    else:
+        return None, None
+
+    _stats_cache = (cache_key, body, etag)
+    return body, etag
@@ -0,0 +1,170 @@
+"""
+In-process event bus behind the /api/events Server-Sent Events stream.
+The pipeline publishes events; every open stream waits on one shared
+condition, so idle dashboards cost nothing until something happens.
+
+Events are also appended to a small relay file in the data directory. When
+the pipeline runs in its own process (python -m app.scheduler), one relay
+thread per web worker tails that file and republishes the pipeline's events
+to the worker's streams.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients reconnecting with Last-Event-ID
+HISTORY_SIZE = 200
+
+_condition = threading.Condition()
+_history = deque(maxlen=HISTORY_SIZE)
+_last_id = 0
+
+# Event IDs sent to clients are "<epoch>-<n>". The epoch is new for every
+# process, so a Last-Event-ID from before a restart (or from another worker)
+# is recognised as foreign and the client starts from the current head.
+EPOCH = uuid.uuid4().hex[:8]
+
+
+RELAY_FILE = os.path.join("data", "event_relay.jsonl")
+# Rewritten with its newer half once it grows past this
+RELAY_MAX_BYTES = 256 * 1024
+RELAY_POLL_SECONDS = 1.0
+
+_relay_thread = None
+_relay_lock = threading.Lock()
+
+
+def _publish_local(event_type, data):
+    global _last_id
+    with _condition:
+        _last_id += 1
+        _history.append((_last_id, event_type, data))
+        _condition.notify_all()
+    logger.debug(f"Published event {_last_id}: {event_type}")
+    return _last_id
+
+
+def publish(event_type, data):
+    """Record an event, wake every waiting stream and relay it to other processes"""
+    event_id = _publish_local(event_type, data)
+    try:
+        _append_relay({"origin": EPOCH, "ts": time.time(), "type": event_type, "data": data})
+    except OSError as e:
+        logger.error(f"Error relaying event {event_type}: {e}")
+    return event_id
+
+
+def _append_relay(message):
+    os.makedirs(os.path.dirname(RELAY_FILE) or ".", exist_ok=True)
+    # One small O_APPEND write per event, so concurrent publishers do not interleave
+    with open(RELAY_FILE, 'ab') as f:
+        f.write((json.dumps(message, default=str) + "\n").encode('utf-8'))
+        size = f.tell()
+    if size > RELAY_MAX_BYTES:
+        with open(RELAY_FILE, 'rb') as f:
+            lines = f.readlines()
+        tmp_path = f"{RELAY_FILE}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.writelines(lines[len(lines) // 2:])
+        os.replace(tmp_path, RELAY_FILE)
+
+
+def _follow_relay():
+    """Republish events other processes appended to the relay file"""
+    position = None
+    inode = None
+    # Newest relayed event seen; a rewritten file is re-read past this point
+    last_ts = 0.0
+    while True:
+        try:
+            st = os.stat(RELAY_FILE)
+        except FileNotFoundError:
+            st = None
+        if st is None:
+            position, inode = 0, None
+        elif position is None or st.st_ino != inode or st.st_size < position:
+            # First look: follow what comes next. Rewritten: re-read, skipping seen events
+            position, inode = (st.st_size if position is None else 0), st.st_ino
+            continue
+        elif st.st_size > position:
+            with open(RELAY_FILE, 'rb') as f:
+                f.seek(position)
+                chunk = f.read(st.st_size - position)
+            # A partly written last line is read again on the next poll
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            position += len(complete)
+            for line in complete.splitlines():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                ts = message.get("ts", 0)
+                if ts <= last_ts:
+                    continue
+                last_ts = ts
+                if message.get("origin") != EPOCH:
+                    _publish_local(message["type"], message["data"])
+        time.sleep(RELAY_POLL_SECONDS)
+
+
+def start_relay():
+    """Start this process's relay thread (once)"""
+    global _relay_thread
+    with _relay_lock:
+        if _relay_thread is None:
+            _relay_thread = threading.Thread(target=_follow_relay, name="event-relay", daemon=True)
+            _relay_thread.start()
+
+
+def last_event_id():
+    return _last_id
+
+
+def parse_event_id(value):
+    """Local event number of a Last-Event-ID, or None if it is not from this process"""
+    if not value:
+        return None
+    epoch, _, number = str(value).partition("-")
+    if epoch != EPOCH or not number.isdigit() or int(number) > _last_id:
+        return None
+    return int(number)
+
+
+def wait_for_events(after_id, timeout):
+    """Block until events newer than after_id exist (or timeout); return them"""
+    with _condition:
+        _condition.wait_for(lambda: _last_id > after_id, timeout=timeout)
+        return [event for event in _history if event[0] > after_id]
+
+
+def format_sse(event_id, event_type, data):
+    return f"id: {EPOCH}-{event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream(after_id=None, heartbeat=20):
+    """
+    Generator of SSE frames. Starts after after_id (a Last-Event-ID issued by
+    this process) or at the current head, and sends a comment line every
+    heartbeat seconds so proxies keep the connection open and dead clients
+    are detected.
+    """
+    start_relay()
+    cursor = parse_event_id(after_id)
+    if cursor is None:
+        cursor = last_event_id()
+    yield "retry: 5000\n\n"
+    while True:
+        pending = wait_for_events(cursor, heartbeat)
+        if not pending:
+            yield ": keep-alive\n\n"
+            continue
+        for event_id, event_type, data in pending:
+            cursor = event_id
+            yield format_sse(event_id, event_type, data)
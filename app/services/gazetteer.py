@@ -0,0 +1,158 @@
+"""
+Dictionary matching of known location names in article text.
+
+Location names and their aliases are indexed as token sequences, so a text is
+scanned once, with a few hash lookups per word, instead of going through NER.
+The longest alias starting at a word wins ("Nuwara Eliya" before "Eliya").
+Names are compared after case folding and removing Latin diacritics, so
+"Mātara" and "MATARA" are the same key; Sinhala and Tamil text is kept as-is
+apart from zero-width joiners. In article text a Latin name only counts when
+it is capitalised and not the start of a street name ("Galle Road"). A
+one-word name followed by another capitalised word may belong to a longer
+name ("Ella Fitzgerald"), so it is left for NER to confirm.
+"""
+
+import re
+import hashlib
+import unicodedata
+
+# Words, including Sinhala and Tamil vowel signs (which \w does not cover)
+TOKEN_RE = re.compile(r"[\w\u0B80-\u0BFF\u0D80-\u0DFF]+")
+# Combining Diacritical Marks block (accents on Latin letters)
+_LATIN_MARKS_RE = re.compile(r"[\u0300-\u036f]")
+_JOINERS_RE = re.compile(r"[\u200c\u200d]")
+
+# An entity containing a known name only resolves to it when it is not much
+# longer than the name ("Colombo District" -> Colombo)
+MAX_EXTRA_CHARS = 15
+
+# A name followed by one of these is a street, not the place
+STREET_WORDS = {"road", "street", "mawatha", "lane", "avenue", "highway", "expressway"}
+
+# Part of the fingerprint, so stored results are redone when matching rules change
+MATCHING_VERSION = 2
+
+
+def _strip(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = _JOINERS_RE.sub("", _LATIN_MARKS_RE.sub("", text))
+    return unicodedata.normalize("NFC", text)
+
+
+def normalize(text):
+    return _strip(text).casefold()
+
+
+def tokens(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def _capitalised(word):
+    # Sinhala and Tamil have no case; they count as capitalised
+    return not word[:1].islower()
+
+
+def capitalised_phrases(text):
+    """Runs of capitalised Latin words with only spaces between them ("Kotuwa Market")"""
+    if not isinstance(text, str):
+        return []
+    text = _strip(text)
+    phrases, run, last_end = [], [], 0
+    for m in TOKEN_RE.finditer(text):
+        word = m.group()
+        if not word[:1].isupper():
+            run = []
+        elif run and not text[last_end:m.start()].strip():
+            run.append(word)
+        else:
+            run = [word]
+            phrases.append(run)
+        last_end = m.end()
+    return [" ".join(words) for words in phrases]
+
+
+class Gazetteer:
+    """Token-sequence index of aliases -> canonical location name"""
+
+    def __init__(self, names, aliases=None):
+        self.index = {}
+        for name in names:
+            self._add(name, name)
+        for name, variants in (aliases or {}).items():
+            for variant in variants:
+                self._add(variant, name)
+        self.first_tokens = {key[0] for key in self.index}
+        self.max_tokens = max((len(key) for key in self.index), default=0)
+        # Stored results are only reused while the aliases they were matched with are unchanged
+        entries = sorted(f"{' '.join(key)}={name}" for key, name in self.index.items())
+        entries.append(f"matching={MATCHING_VERSION}")
+        self.fingerprint = hashlib.sha1("\n".join(entries).encode('utf-8')).hexdigest()[:8]
+
+    def _add(self, alias, name):
+        key = tuple(tokens(alias))
+        if key:
+            self.index[key] = name
+
+    def _scan(self, words, original=None):
+        """
+        (canonical name, matched alias key, position) for each alias in a
+        token list. With the original-case tokens, lowercase words never match.
+        """
+        i = 0
+        while i < len(words):
+            if words[i] not in self.first_tokens or (original and not _capitalised(original[i])):
+                i += 1
+                continue
+            for n in range(min(self.max_tokens, len(words) - i), 0, -1):
+                key = tuple(words[i:i + n])
+                name = self.index.get(key)
+                if name is None or (original and not all(_capitalised(w) for w in original[i:i + n])):
+                    continue
+                if i + n >= len(words) or words[i + n] not in STREET_WORDS:
+                    yield name, key, i
+                i += n
+                break
+            else:
+                i += 1
+
+    def matches(self, text):
+        """
+        (found, unconfirmed): canonical names mentioned in text, in order of
+        first mention, and the one-word names that may be part of a longer name
+        """
+        if not isinstance(text, str):
+            return [], []
+        text = _strip(text)
+        spans = [m.span() for m in TOKEN_RE.finditer(text)]
+        original = [text[start:end] for start, end in spans]
+        words = [w.casefold() for w in original]
+        found, unconfirmed = [], []
+        for name, key, i in self._scan(words, original):
+            end = i + len(key)
+            # The next word in the same phrase (no punctuation in between) is capitalised
+            if len(key) == 1 and end < len(original) and original[end][:1].isupper() \
+                    and not text[spans[end - 1][1]:spans[end][0]].strip():
+                if name not in unconfirmed:
+                    unconfirmed.append(name)
+            elif name not in found:
+                found.append(name)
+        return found, [name for name in unconfirmed if name not in found]
+
+    def find(self, text):
+        """Canonical names mentioned in text, in order of first mention"""
+        return self.matches(text)[0]
+
+    def resolve(self, entity):
+        """Canonical names an extracted entity refers to"""
+        if not isinstance(entity, str):
+            return []
+        words = tokens(entity)
+        name = self.index.get(tuple(words))
+        if name is not None:
+            return [name]
+        length = len(" ".join(words))
+        found = []
+        for name, key, _ in self._scan(words):
+            if length < len(" ".join(key)) + MAX_EXTRA_CHARS and name not in found:
+                found.append(name)
+        return found
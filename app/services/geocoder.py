@@ -0,0 +1,134 @@
+"""
+Offline geocoder for place names outside SRI_LANKA_LOCATIONS.
+
+Loads a GeoNames country extract (data/gazetteer/LK.txt, from
+https://download.geonames.org/export/dump/LK.zip) into sorted arrays: one
+normalized key per name and alternate name, pointing at the most populous
+place with that name. Lookups are a binary search, with no network calls.
+Without the file the geocoder is empty and every lookup returns None.
+"""
+
+import os
+import bisect
+import hashlib
+import threading
+import logging
+from array import array
+from app.services.gazetteer import tokens
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.environ.get("SIGNALS_GAZETTEER_PATH", os.path.join("data", "gazetteer", "LK.txt"))
+
+# GeoNames feature classes kept: admin areas, hydrography, areas, populated places, terrain
+FEATURE_CLASSES = {"A", "H", "L", "P", "T"}
+# Whole-country features would put every mention of the country on one point
+SKIPPED_FEATURE_CODES = {"PCLI", "PCL", "PCLD", "PCLS", "PCLF", "PCLIX"}
+# Shorter keys are mostly abbreviations that collide with ordinary words
+MIN_KEY_LENGTH = 3
+
+
+def _key(name):
+    return " ".join(tokens(name))
+
+
+class Geocoder:
+    """Sorted name keys with parallel place arrays"""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.path = path
+        self.keys = []
+        self.places = array('I')
+        self.names = []
+        self.lats = array('f')
+        self.lons = array('f')
+        self.fingerprint = "none"
+        if os.path.exists(path):
+            self._load(path)
+        else:
+            logger.info(f"No gazetteer at {path}; unknown place names will not be geocoded")
+
+    def _load(self, path):
+        best = {}
+        populations = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 15 or fields[6] not in FEATURE_CLASSES or fields[7] in SKIPPED_FEATURE_CODES:
+                    continue
+                try:
+                    lat, lon = float(fields[4]), float(fields[5])
+                    population = int(fields[14] or 0)
+                except ValueError:
+                    continue
+                place = len(self.names)
+                self.names.append(fields[1])
+                self.lats.append(lat)
+                self.lons.append(lon)
+                populations.append(population)
+                alternates = fields[3].split(",") if fields[3] else []
+                for name in [fields[1], fields[2]] + alternates:
+                    key = _key(name)
+                    if len(key) < MIN_KEY_LENGTH:
+                        continue
+                    # A shared name goes to the most populous place
+                    current = best.get(key)
+                    if current is None or population > populations[current]:
+                        best[key] = place
+
+        self.keys = sorted(best)
+        self.places = array('I', (best[key] for key in self.keys))
+        st = os.stat(path)
+        self.fingerprint = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:8]
+        logger.info(f"Loaded gazetteer {path}: {len(self.names)} places, {len(self.keys)} names")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _place(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.places[i]
+        return None
+
+    def _result(self, place):
+        return self.names[place], round(self.lats[place], 4), round(self.lons[place], 4)
+
+    def locate(self, name):
+        """(name, lat, lon) of a place name, or None"""
+        place = self._place(_key(name)) if isinstance(name, str) else None
+        return None if place is None else self._result(place)
+
+    def resolve(self, entity):
+        """
+        (name, lat, lon) for an extracted entity: the longest run of its
+        leading words that is a known name ("Kelaniya Temple" -> Kelaniya)
+        """
+        if not isinstance(entity, str) or not self.keys:
+            return None
+        words = tokens(entity)
+        if words and words[0] == "the":
+            words = words[1:]
+        for n in range(len(words), 0, -1):
+            key = " ".join(words[:n])
+            if len(key) < MIN_KEY_LENGTH:
+                break
+            place = self._place(key)
+            if place is not None:
+                return self._result(place)
+        return None
+
+
+# Global geocoder instance
+_geocoder = None
+_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Load the gazetteer once (singleton pattern)"""
+    global _geocoder
+    if _geocoder is None:
+        with _lock:
+            if _geocoder is None:
+                _geocoder = Geocoder()
+    return _geocoder
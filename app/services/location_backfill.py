@@ -0,0 +1,108 @@
+"""
+Location extraction backfill over archived articles.
+
+Articles are read from the date-partitioned archive, split into chunks and
+located by a pool of worker processes, each with its own spaCy model. Every
+finished chunk is written to the location store straight away, so an
+interrupted backfill picks up where it stopped: articles already stored for
+the same text (and mode) are skipped.
+
+    python -m app.services.location_backfill --since 2026-01-01 --processes 8
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.services import archive, location_store, nlp_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _init_worker():
+    # Load the model once per process rather than once per chunk
+    try:
+        nlp_service.load_nlp_model()
+    except OSError:
+        pass
+
+
+def _locate_chunk(texts, mode):
+    return nlp_service.locate_texts(texts, mode)
+
+
+def load_articles(since=None, until=None, data_dir="data"):
+    """Archived (article_id, text) pairs published between since and until"""
+    df = archive.query(since, until, ["article_id", "Title", "Summary"], data_dir)
+    if df.empty:
+        return []
+    df = df.drop_duplicates(subset=["article_id"], keep="last")
+    df = df.reindex(columns=["article_id", "Title", "Summary"]).fillna("")
+    return [(aid, nlp_service.article_text(t, s)) for aid, t, s in zip(df["article_id"], df["Title"], df["Summary"])]
+
+
+def backfill(since=None, until=None, processes=None, chunk_size=DEFAULT_CHUNK_SIZE,
+             mode=nlp_service.LOCATION_MODE, data_dir="data", store_path=None):
+    """
+    Locate every archived article that has no stored result yet.
+    Returns a summary with counts and throughput.
+    """
+    store_path = store_path or os.path.join(data_dir, "locations.db")
+    processes = processes or os.cpu_count() or 1
+    articles = load_articles(since, until, data_dir)
+
+    hashes = {aid: nlp_service.result_hash(text, mode) for aid, text in articles}
+    stored = location_store.get_many(hashes, store_path)
+    pending = [(aid, text) for aid, text in articles if aid not in stored]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    logger.info(f"Backfill: {len(articles)} archived articles, {len(stored)} already stored, "
+                f"{len(pending)} to locate in {len(chunks)} chunks on {processes} processes")
+
+    summary = {"articles": len(articles), "skipped": len(stored), "located": 0, "incomplete": 0}
+    started = time.perf_counter()
+
+    def save(chunk, results):
+        rows = [(aid, hashes[aid], entities, locations)
+                for (aid, _), (entities, locations, complete) in zip(chunk, results) if complete]
+        location_store.put_many(rows, store_path)
+        summary["located"] += len(rows)
+        summary["incomplete"] += len(chunk) - len(rows)
+        done = summary["located"] + summary["incomplete"]
+        elapsed = time.perf_counter() - started
+        logger.info(f"Backfill: {done}/{len(pending)} articles "
+                    f"({done / max(elapsed, 1e-9):.0f} articles/s)")
+
+    if processes == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            save(chunk, _locate_chunk([text for _, text in chunk], mode))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+            futures = {pool.submit(_locate_chunk, [text for _, text in chunk], mode): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                save(futures[future], future.result())
+
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["articles_per_s"] = round(len(pending) / max(elapsed, 1e-9), 1)
+    if summary["incomplete"]:
+        logger.warning(f"Backfill: {summary['incomplete']} articles need NER but the spaCy model is missing")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description="Extract locations for archived articles")
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--mode", choices=nlp_service.LOCATION_MODES, default=nlp_service.LOCATION_MODE)
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    result = backfill(args.since, args.until, args.processes, args.chunk_size, args.mode, args.data_dir)
+    print(result)
@@ -0,0 +1,94 @@
+"""
+Persistent per-article location extraction results.
+
+Entities found by NER and the known locations they matched are stored in
+data/locations.db keyed by article_id, together with a hash of the text they
+were extracted from. An article is only analysed again when its text changes.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOCATIONS_DB = os.path.join("data", "locations.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS article_locations (
+    article_id TEXT PRIMARY KEY,
+    text_hash TEXT NOT NULL,
+    entities TEXT NOT NULL,
+    locations TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+# One connection per thread (sqlite3 connections are not shared across threads)
+_local = threading.local()
+
+
+def connect(path=LOCATIONS_DB):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _connection(path):
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    if path not in conns:
+        conns[path] = connect(path)
+    return conns[path]
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def get_many(hashes, path=LOCATIONS_DB):
+    """
+    Stored results for {article_id: text_hash}, skipping articles that are
+    unknown or whose text changed. Returns {article_id: (entities, locations)}.
+    """
+    conn = _connection(path)
+    ids = list(hashes)
+    found = {}
+    for start in range(0, len(ids), _LOOKUP_CHUNK):
+        chunk = ids[start:start + _LOOKUP_CHUNK]
+        rows = conn.execute(
+            f"SELECT article_id, text_hash, entities, locations FROM article_locations "
+            f"WHERE article_id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        for article_id, stored_hash, entities, locations in rows:
+            if hashes[article_id] == stored_hash:
+                found[article_id] = (json.loads(entities), json.loads(locations))
+    return found
+
+
+def put_many(results, path=LOCATIONS_DB):
+    """Store (article_id, text_hash, entities, locations) tuples"""
+    if not results:
+        return
+    now = datetime.now().isoformat(timespec='seconds')
+    conn = _connection(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO article_locations (article_id, text_hash, entities, locations, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(article_id) DO UPDATE SET "
+            "text_hash=excluded.text_hash, entities=excluded.entities, "
+            "locations=excluded.locations, updated_at=excluded.updated_at",
+            [(aid, h, json.dumps(entities), json.dumps(locations), now) for aid, h, entities, locations in results],
+        )
+    logger.info(f"Stored locations for {len(results)} articles")
@@ -1,14 +1,14 @@
 import requests
 from bs4 import BeautifulSoup
-import json
-import os
 from datetime import datetime, timedelta
 import logging
 from app.services.proxy_manager import proxy_manager
+from app.services.market_store import market_store, SERIES
 
 logger = logging.getLogger(__name__)
 
-MARKET_DATA_FILE = "data/market_history.json"
+# Observations returned by the per-series market endpoints (the last N, not N days)
+HISTORY_POINTS = 30
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -105,140 +105,97 @@ def fetch_inflation():
         logger.error(f"Error fetching inflation: {e}")
         return None
 
-def load_market_history():
-    """Load historical market data from JSON file"""
-    if not os.path.exists(MARKET_DATA_FILE):
-        return {
-            "usd_lkr": [],
-            "gold": [],
-            "fuel": [],
-            "inflation": []
-        }
-    
-    try:
-        with open(MARKET_DATA_FILE, 'r') as f:
-            data = json.load(f)
-            # Ensure inflation key exists for backward compatibility
-            if "inflation" not in data:
-                data["inflation"] = []
-            return data
-    except Exception as e:
-        logger.error(f"Error loading market history: {e}")
-        return {
-            "usd_lkr": [],
-            "gold": [],
-            "fuel": [],
-            "inflation": []
-        }
+def load_market_history(count=HISTORY_POINTS):
+    """Last observations of every series, as served by the market endpoints"""
+    return {series: market_store.recent(series, count) for series in SERIES}
 
-def save_market_history(history):
-    """Save historical market data to JSON file"""
-    try:
-        os.makedirs(os.path.dirname(MARKET_DATA_FILE), exist_ok=True)
-        with open(MARKET_DATA_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
-        logger.info("Market history saved successfully")
-    except Exception as e:
-        logger.error(f"Error saving market history: {e}")
+def _is_new(series, today):
+    latest = market_store.latest(series)
+    return latest is None or latest["date"] != today
 
 def update_market_data():
-    """Fetch current market data and update history"""
-    history = load_market_history()
+    """Fetch current market data and append today's observations"""
     today = datetime.now().strftime("%Y-%m-%d")
+    observations = []
     
     # Fetch USD/LKR
     usd_rate = fetch_usd_lkr()
-    if usd_rate:
-        # Check if today's data already exists
-        if not history["usd_lkr"] or history["usd_lkr"][-1]["date"] != today:
-            history["usd_lkr"].append({
-                "date": today,
-                "value": usd_rate
-            })
-            # Keep only last 30 days
-            history["usd_lkr"] = history["usd_lkr"][-30:]
+    if usd_rate and _is_new("usd_lkr", today):
+        observations.append(("usd_lkr", today, usd_rate))
     
     # Fetch Gold Price
     gold_price = fetch_gold_price()
-    if gold_price:
-        if not history["gold"] or history["gold"][-1]["date"] != today:
-            history["gold"].append({
-                "date": today,
-                "value": gold_price
-            })
-            history["gold"] = history["gold"][-30:]
+    if gold_price and _is_new("gold", today):
+        observations.append(("gold", today, gold_price))
     
     # Fetch Fuel Prices
     fuel_prices = fetch_fuel_prices()
-    if fuel_prices:
-        if not history["fuel"] or history["fuel"][-1]["date"] != today:
-            history["fuel"].append({
-                "date": today,
-                "values": fuel_prices
-            })
-            history["fuel"] = history["fuel"][-30:]
+    if fuel_prices and _is_new("fuel", today):
+        observations.append(("fuel", today, fuel_prices))
     
     # Fetch Inflation Rate
     inflation_rate = fetch_inflation()
-    if inflation_rate is not None:
-        if not history["inflation"] or history["inflation"][-1]["date"] != today:
-            history["inflation"].append({
-                "date": today,
-                "value": inflation_rate
-            })
-            history["inflation"] = history["inflation"][-30:]
+    if inflation_rate is not None and _is_new("inflation", today):
+        observations.append(("inflation", today, inflation_rate))
     
-    save_market_history(history)
-    return history
+    market_store.append_many(observations)
+    logger.info(f"Recorded {len(observations)} market observations")
+    return load_market_history()
+
+def get_market_history(series, start=None, end=None, resolution="auto"):
+    """Full-range history of one series, downsampled for long ranges"""
+    if series not in SERIES:
+        raise ValueError(f"Unknown series: {series}")
+    return {
+        "series": series,
+        "latest": market_store.latest(series),
+        "history": market_store.range(series, start, end, resolution)
+    }
 
 def get_usd_lkr_data():
     """Get USD/LKR current and historical data"""
-    history = load_market_history()
     current = fetch_usd_lkr()
     
     return {
         "current": current,
-        "history": history.get("usd_lkr", [])
+        "history": market_store.recent("usd_lkr", HISTORY_POINTS)
     }
 
 def get_gold_data():
     """Get gold price current and historical data"""
-    history = load_market_history()
     current = fetch_gold_price()
     
     return {
         "current": current,
-        "history": history.get("gold", [])
+        "history": market_store.recent("gold", HISTORY_POINTS)
     }
 
 def get_fuel_data():
     """Get fuel prices current and historical data"""
-    history = load_market_history()
     current = fetch_fuel_prices()
     
     return {
         "current": current,
-        "history": history.get("fuel", [])
+        "history": market_store.recent("fuel", HISTORY_POINTS)
     }
 
 def get_inflation_data():
     """Get inflation rate current and historical data"""
-    history = load_market_history()
     current = fetch_inflation()
     
     return {
         "current": current,
-        "history": history.get("inflation", [])
+        "history": market_store.recent("inflation", HISTORY_POINTS)
     }
 
 def initialize_sample_data():
     """Initialize 30 days of sample historical data for demonstration"""
     import random
     
-    history = load_market_history()
+    history = {series: [] for series in SERIES}
     
     # Only initialize if data is empty
-    if history["usd_lkr"] or history["gold"] or history["fuel"] or history["inflation"]:
+    if not market_store.is_empty():
         logger.info("Historical data already exists, skipping sample data initialization")
         return
     
@@ -302,5 +259,8 @@ def initialize_sample_data():
             "value": round(value, 2)
         })
     
-    save_market_history(history)
+    market_store.append_many([
+        (series, point["date"], point["values"] if "values" in point else point["value"])
+        for series, points in history.items() for point in points
+    ])
     logger.info("Sample data initialized successfully")
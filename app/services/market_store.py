@@ -0,0 +1,306 @@
+"""
+Append-only time-series store for market history.
+
+Observations are appended as fsynced JSON lines to data/market/journal.jsonl
+and kept in memory as per-series sorted arrays. A periodic snapshot records
+the series up to a journal offset, so loading replays only the newer lines,
+and readers in other processes pick up appends by reading just the new tail.
+compact() rewrites the journal with one line per (series, date).
+"""
+
+import os
+import json
+import bisect
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.path.join("data", "market")
+JOURNAL_FILE = os.path.join(STORE_DIR, "journal.jsonl")
+LEGACY_FILE = os.path.join("data", "market_history.json")
+SNAPSHOT_NAME = "snapshot.json"
+
+# Snapshot the in-memory series after this many journal bytes since the last one
+SNAPSHOT_EVERY_BYTES = 64 * 1024
+
+SERIES = ("usd_lkr", "gold", "fuel", "inflation")
+
+# Ranges longer than these many days are downsampled when resolution="auto"
+AUTO_DAILY_MAX_DAYS = 92
+AUTO_WEEKLY_MAX_DAYS = 730
+RESOLUTIONS = ("auto", "daily", "weekly", "monthly")
+
+
+def _point_value(point):
+    """Scalar series store "value"; fuel stores a "values" dict per fuel type"""
+    return point["values"] if "values" in point else point["value"]
+
+
+def _make_point(day, value):
+    return {"date": day, "values": value} if isinstance(value, dict) else {"date": day, "value": value}
+
+
+def _journal_line(series, day, value):
+    record = {"series": series, "date": day}
+    record["values" if isinstance(value, dict) else "value"] = value
+    return json.dumps(record) + "\n"
+
+
+def _write_durable(path, data):
+    """Replace path with data via a fsynced temp file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _journal_lock(lock_path):
+    """Serialise journal writers across processes"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _bucket(day, resolution):
+    """Label of the period a YYYY-MM-DD date falls into"""
+    if resolution == "monthly":
+        return day[:7] + "-01"
+    if resolution == "weekly":
+        d = date.fromisoformat(day)
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return day
+
+
+class TimeSeriesStore:
+    """In-memory view of the market journal, refreshed incrementally"""
+
+    def __init__(self, journal_path=JOURNAL_FILE, legacy_path=LEGACY_FILE):
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self.snapshot_path = os.path.join(os.path.dirname(journal_path), SNAPSHOT_NAME)
+        self.lock_path = f"{journal_path}.lock"
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # series -> (sorted dates, points in the same order)
+        self._dates = {name: [] for name in SERIES}
+        self._points = {name: [] for name in SERIES}
+        self._offset = 0
+        self._snapshot_offset = 0
+        self._inode = None
+
+    def _apply(self, record):
+        series = record.get("series")
+        day = record.get("date")
+        if series is None or day is None:
+            return
+        dates = self._dates.setdefault(series, [])
+        points = self._points.setdefault(series, [])
+        point = _make_point(day, record["values"] if "values" in record else record.get("value"))
+        # Journals are almost always appended in date order
+        if not dates or day > dates[-1]:
+            dates.append(day)
+            points.append(point)
+            return
+        i = bisect.bisect_left(dates, day)
+        if i < len(dates) and dates[i] == day:
+            points[i] = point
+        else:
+            dates.insert(i, day)
+            points.insert(i, point)
+
+    def _migrate_legacy(self):
+        """Seed the journal from market_history.json written by older versions"""
+        if os.path.exists(self.journal_path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading legacy market history: {e}")
+            return
+        lines = [
+            _journal_line(series, point["date"], _point_value(point))
+            for series, points in legacy.items() for point in points
+        ]
+        _write_durable(self.journal_path, "".join(lines).encode('utf-8'))
+        logger.info(f"Migrated {len(lines)} market observations from {self.legacy_path}")
+
+    def _load_snapshot(self, st):
+        """
+        Start from the snapshot when it describes a prefix of this journal file;
+        only the journal lines after its offset then need replaying.
+        """
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logger.warning("Ignoring unreadable market snapshot")
+            return
+        if snapshot.get("inode") != st.st_ino or snapshot.get("offset", 0) > st.st_size:
+            return
+        for series, rows in snapshot["series"].items():
+            self._dates[series] = [day for day, _ in rows]
+            self._points[series] = [_make_point(day, value) for day, value in rows]
+        self._offset = self._snapshot_offset = snapshot["offset"]
+
+    def refresh(self):
+        """Apply journal lines appended since the last read (by any process)"""
+        with self._lock:
+            if self._inode is None:
+                self._migrate_legacy()
+            try:
+                st = os.stat(self.journal_path)
+            except FileNotFoundError:
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                # First load, or the journal was compacted: start over
+                self._reset()
+                self._inode = st.st_ino
+                self._load_snapshot(st)
+            if st.st_size == self._offset:
+                return
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+            # Leave a partially written last line for the next refresh
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        logger.warning("Skipping unreadable market journal line")
+            self._offset += end
+
+    def append_many(self, observations):
+        """
+        Append (series, date, value) observations to the journal. The write is
+        fsynced before returning, so an acknowledged update survives a crash.
+        """
+        if not observations:
+            return
+        data = "".join(_journal_line(series, day, value) for series, day, value in observations).encode('utf-8')
+        with self._lock, _journal_lock(self.lock_path):
+            self.refresh()
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() > self._offset:
+                    # A crash left a torn line; terminate it so it is skipped
+                    data = b"\n" + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh()
+            if self._offset - self._snapshot_offset >= SNAPSHOT_EVERY_BYTES:
+                self.write_snapshot()
+
+    def write_snapshot(self):
+        """Persist the in-memory series so loaders only replay newer journal lines"""
+        with self._lock:
+            self.refresh()
+            if self._inode is None:
+                return
+            snapshot = {
+                "inode": self._inode,
+                "offset": self._offset,
+                "series": {
+                    series: [[point["date"], _point_value(point)] for point in points]
+                    for series, points in self._points.items()
+                },
+            }
+            _write_durable(self.snapshot_path, json.dumps(snapshot).encode('utf-8'))
+            self._snapshot_offset = self._offset
+
+    def compact(self):
+        """Rewrite the journal with one line per (series, date) and snapshot it"""
+        with self._lock, _journal_lock(self.lock_path):
+            self.refresh()
+            if self._inode is None:
+                return 0
+            lines = [
+                _journal_line(series, point["date"], _point_value(point))
+                for series, points in self._points.items() for point in points
+            ]
+            _write_durable(self.journal_path, "".join(lines).encode('utf-8'))
+            self._inode = None
+            self.refresh()
+            self.write_snapshot()
+        logger.info(f"Compacted market journal to {len(lines)} observations")
+        return len(lines)
+
+    def append(self, series, day, value):
+        self.append_many([(series, day, value)])
+
+    def latest(self, series):
+        """Most recent point of a series, or None"""
+        self.refresh()
+        points = self._points.get(series)
+        return points[-1] if points else None
+
+    def is_empty(self):
+        self.refresh()
+        return not any(self._points.values())
+
+    def range(self, series, start=None, end=None, resolution="daily"):
+        """
+        Points of a series between start and end (YYYY-MM-DD, inclusive).
+        weekly/monthly keep the last observation of each period, labelled with
+        the period's first day; "auto" picks the resolution from the span.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        self.refresh()
+        with self._lock:
+            dates = self._dates.get(series, [])
+            lo = bisect.bisect_left(dates, start) if start else 0
+            hi = bisect.bisect_right(dates, end) if end else len(dates)
+            points = self._points.get(series, [])[lo:hi]
+        if resolution == "auto":
+            resolution = self._auto_resolution(points)
+        if resolution == "daily" or not points:
+            return points
+
+        buckets = {}
+        for point in points:
+            buckets[_bucket(point["date"], resolution)] = _point_value(point)
+        return [_make_point(day, value) for day, value in buckets.items()]
+
+    @staticmethod
+    def _auto_resolution(points):
+        if len(points) < 2:
+            return "daily"
+        span = (date.fromisoformat(points[-1]["date"]) - date.fromisoformat(points[0]["date"])).days
+        if span <= AUTO_DAILY_MAX_DAYS:
+            return "daily"
+        return "weekly" if span <= AUTO_WEEKLY_MAX_DAYS else "monthly"
+
+    def recent(self, series, count):
+        """The last `count` points of a series, however far apart they are"""
+        self.refresh()
+        with self._lock:
+            return self._points.get(series, [])[-count:] if count > 0 else []
+
+# Global instance
+market_store = TimeSeriesStore()
@@ -3,11 +3,12 @@ NLP Service for Location Extraction from News Articles
 Extracts location entities from processed news content (all sources) using spaCy NLP
 """
 
-import pandas as pd
+import os
 import spacy
 from collections import Counter
 import logging
-import os
+import time
+from app.services import data_store, location_store, gazetteer, geocoder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -58,18 +59,75 @@ SRI_LANKA_LOCATIONS = {
     "Mirissa": {"lat": 5.9482, "lon": 80.4716, "count": 0},
 }
 
-DATA_FILE = os.path.join("data", "final_data.csv")
+# Other names the same places go by in news text: English variants, then
+# Sinhala and Tamil names
+LOCATION_ALIASES = {
+    "Colombo": ["Colombo Fort", "Galle Face", "කොළඹ", "கொழும்பு"],
+    "Kandy": ["Mahanuwara", "Senkadagala", "මහනුවර", "கண்டி"],
+    "Galle": ["ගාල්ල", "காலி"],
+    "Jaffna": ["Yalpanam", "යාපනය", "யாழ்ப்பாணம்"],
+    "Trincomalee": ["Trinco", "Tirukonamalai", "ත්‍රිකුණාමලය", "திருகோணமலை"],
+    "Anuradhapura": ["Anuradapura", "අනුරාධපුරය", "அனுராதபுரம்"],
+    "Matara": ["මාතර", "மாத்தறை"],
+    "Negombo": ["Migamuwa", "මීගමුව", "நீர்கொழும்பு"],
+    "Kurunegala": ["Kurunagala", "කුරුණෑගල", "குருநாகல்"],
+    "Hambantota": ["Hambanthota", "හම්බන්තොට", "அம்பாந்தோட்டை"],
+    "Batticaloa": ["Baticaloa", "Madakalapuwa", "මඩකලපුව", "மட்டக்களப்பு"],
+    "Ratnapura": ["Rathnapura", "රත්නපුර", "இரத்தினபுரி"],
+    "Nuwara Eliya": ["Nuwaraeliya", "නුවරඑළිය", "நுவரெலியா"],
+    "Badulla": ["බදුල්ල", "பதுளை"],
+    "Kegalle": ["Kegalla", "කෑගල්ල", "கேகாலை"],
+    "Matale": ["මාතලේ", "மாத்தளை"],
+    "Gampaha": ["ගම්පහ", "கம்பஹா"],
+    "Kalutara": ["Kaluthara", "කළුතර", "களுத்துறை"],
+    "Monaragala": ["Moneragala", "මොණරාගල", "மொனராகலை"],
+    "Puttalam": ["පුත්තලම", "புத்தளம்"],
+    "Vavuniya": ["වවුනියාව", "வவுனியா"],
+    "Mannar": ["මන්නාරම", "மன்னார்"],
+    "Ampara": ["Amparai", "අම්පාර", "அம்பாறை"],
+    "Polonnaruwa": ["Polonnaruva", "පොළොන්නරුව", "பொலன்னறுவை"],
+    "Kilinochchi": ["Kilinochi", "කිලිනොච්චිය", "கிளிநொச்சி"],
+    "Mullaitivu": ["Mullaithivu", "Mullativu", "මුලතිව්", "முல்லைத்தீவு"],
+    "Dambulla": ["දඹුල්ල", "தம்புள்ளை"],
+    "Sigiriya": ["සීගිරිය", "சீகிரியா"],
+    "Bentota": ["බෙන්තොට"],
+    "Hikkaduwa": ["හික්කඩුව"],
+    "Unawatuna": ["උණවටුන"],
+    "Ella": ["ඇල්ල"],
+    "Kataragama": ["Katharagama", "කතරගම", "கதிர்காமம்"],
+    # Not "Tissa": it is also a common given name
+    "Tissamaharama": ["තිස්සමහාරාමය"],
+    "Embilipitiya": ["ඇඹිලිපිටිය"],
+    "Chilaw": ["Halawatha", "හලාවත", "சிலாபம்"],
+    "Dehiwala": ["Dehiwela", "Mount Lavinia", "දෙහිවල", "தெஹிவளை"],
+    "Moratuwa": ["මොරටුව", "மொரட்டுவை"],
+    "Kotte": ["Sri Jayawardenepura", "Sri Jayewardenepura", "කෝට්ටේ"],
+    "Tangalle": ["Tangalla", "තංගල්ල"],
+    "Mirissa": ["මිරිස්ස"],
+}
+
+GAZETTEER = gazetteer.Gazetteer(SRI_LANKA_LOCATIONS, LOCATION_ALIASES)
+
+# "gazetteer": NER only for articles without a known name in them;
+# "deep": NER for every article, merged with the gazetteer matches
+LOCATION_MODE = os.environ.get("SIGNALS_LOCATION_MODE", "gazetteer")
+LOCATION_MODES = ("gazetteer", "deep")
 
 # Global NLP model instance
 nlp_model = None
 
+# Only the entity recognizer is used; these components are skipped
+NER_DISABLED = ["parser", "lemmatizer", "attribute_ruler"]
+# Documents per nlp.pipe batch
+NER_BATCH_SIZE = int(os.environ.get("SIGNALS_NER_BATCH_SIZE", "64"))
+
 
 def load_nlp_model():
     """Load spaCy NLP model (singleton pattern)"""
     global nlp_model
     if nlp_model is None:
         try:
-            nlp_model = spacy.load("en_core_web_sm")
+            nlp_model = spacy.load("en_core_web_sm", disable=NER_DISABLED)
             logger.info("spaCy model loaded successfully")
         except OSError:
             logger.error("spaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
@@ -77,6 +135,13 @@ def load_nlp_model():
     return nlp_model
 
 
+def _location_entities(doc):
+    # GPE: Geopolitical entities (countries, cities, states)
+    # LOC: Non-GPE locations (mountain ranges, bodies of water)
+    # FAC: Facilities (buildings, airports, highways, bridges)
+    return [ent.text for ent in doc.ents if ent.label_ in ["GPE", "LOC", "FAC"]]
+
+
 def extract_locations_from_text(text):
     """
     Extract location entities from text using spaCy NLP
@@ -91,83 +156,236 @@ def extract_locations_from_text(text):
         return []
         
     nlp = load_nlp_model()
-    doc = nlp(text)
-    
-    locations = []
-    for ent in doc.ents:
-        # GPE: Geopolitical entities (countries, cities, states)
-        # LOC: Non-GPE locations (mountain ranges, bodies of water)
-        # FAC: Facilities (buildings, airports, highways, bridges)
-        if ent.label_ in ["GPE", "LOC", "FAC"]:
-            locations.append(ent.text)
-    
-    return locations
+    return _location_entities(nlp(text))
+
+
+def extract_locations_batch(texts, batch_size=NER_BATCH_SIZE):
+    """Location entities for each text, run through nlp.pipe in batches"""
+    nlp = load_nlp_model()
+    docs = nlp.pipe((t if isinstance(t, str) else "" for t in texts), batch_size=batch_size)
+    return [_location_entities(doc) for doc in docs]
+
+
+def article_text(title, summary):
+    """Text that locations are extracted from (Title + Summary)"""
+    return str(title) + " " + str(summary)
+
+
+def match_locations(extracted_locations):
+    """
+    Known locations referred to by extracted entities, resolved through the
+    normalized alias index (exact name, or a name inside a slightly longer entity).
+    A set avoids counting an article twice for the same location.
+    """
+    matched_locations_in_article = set()
+    for extracted_loc in extracted_locations:
+        matched_locations_in_article.update(GAZETTEER.resolve(extracted_loc))
+    return sorted(matched_locations_in_article)
+
+
+def place_entry(place):
+    """
+    Location entry of a geocoded place: its name with the coordinates it was
+    resolved to, since several places can share a name ("Pettah@6.94,79.85")
+    """
+    name, lat, lon = place
+    return f"{name}@{lat},{lon}"
+
+
+def parse_place(entry):
+    """(name, lat, lon) of a geocoded location entry, or None"""
+    name, sep, coords = entry.rpartition("@")
+    if not sep:
+        return None
+    try:
+        lat, lon = (float(v) for v in coords.split(","))
+    except ValueError:
+        return None
+    return name, lat, lon
 
 
-def get_location_data():
+def geocode_entities(extracted_locations):
     """
-    Fetch news articles from CSV and extract location frequency data
+    Places from the offline gazetteer file for entities that are not known
+    locations, as place entries. Empty when no gazetteer file is installed.
+    """
+    places = set()
+    for extracted_loc in extracted_locations:
+        if GAZETTEER.resolve(extracted_loc):
+            continue
+        place = geocoder.get_geocoder().resolve(extracted_loc)
+        if place is not None:
+            places.add(place_entry(place))
+    return places
+
+
+def may_need_geocoding(text):
+    """
+    Whether text has a capitalised phrase that is not a known location but
+    starts with a name from the gazetteer file. NER then decides whether it
+    is a place.
+    """
+    places = geocoder.get_geocoder()
+    if not len(places):
+        return False
+    for phrase in gazetteer.capitalised_phrases(text):
+        found, unconfirmed = GAZETTEER.matches(phrase)
+        if not found and not unconfirmed and places.resolve(phrase) is not None:
+            return True
+    return False
+
+
+def locate_texts(texts, mode=LOCATION_MODE):
+    """
+    (entities, matched locations, complete) for each text. Known names are
+    found by the gazetteer; NER runs on texts it found nothing in, texts with
+    one-word names it could not confirm, texts that may name a place only the
+    gazetteer file knows, or every text in deep mode. Other entities NER
+    finds are geocoded offline. complete is False when NER was needed but the
+    spaCy model is unavailable.
+    """
+    scans = [GAZETTEER.matches(text) for text in texts]
+    hits = [found for found, _ in scans]
+    need_ner = [i for i, (found, unconfirmed) in enumerate(scans)
+                if mode == "deep" or not found or unconfirmed or may_need_geocoding(texts[i])]
+    entities = [[] for _ in texts]
+    complete = [True] * len(texts)
+    if need_ner:
+        try:
+            extracted = extract_locations_batch([texts[i] for i in need_ner])
+        except OSError:
+            # spaCy model missing (already logged): keep the gazetteer matches
+            extracted = None
+        for j, i in enumerate(need_ner):
+            if extracted is None:
+                complete[i] = False
+            else:
+                entities[i] = extracted[j]
+    return [
+        (ents, sorted(set(found) | set(match_locations(ents)) | geocode_entities(ents)), done)
+        for ents, found, done in zip(entities, hits, complete)
+    ]
+
+
+def result_hash(text, mode):
+    # Results depend on the mode, the aliases and the gazetteer file as well as
+    # the text; "p2" marks results whose geocoded places carry coordinates and
+    # were looked for in articles with gazetteer matches too
+    return location_store.text_hash(
+        f"{mode}:{GAZETTEER.fingerprint}:{geocoder.get_geocoder().fingerprint}:p2:{text}")
+
+
+def article_locations(df, store_path=location_store.LOCATIONS_DB, mode=LOCATION_MODE):
+    """
+    Matched known locations for each row of df, in order. Results are read
+    from the location store; only articles that are new or whose text changed
+    are analysed, and their results are stored for next time.
+    """
+    if df.empty:
+        return []
+    ids = df["article_id"].tolist()
+    texts = [article_text(t, s) for t, s in zip(df["Title"], df["Summary"])]
+    hashes = {aid: result_hash(text, mode) for aid, text in zip(ids, texts)}
+    stored = location_store.get_many(hashes, store_path)
+
+    missing = [(aid, text) for aid, text in zip(ids, texts) if aid not in stored]
+    new_results = []
+    if missing:
+        started = time.perf_counter()
+        results = locate_texts([text for _, text in missing], mode)
+        elapsed = time.perf_counter() - started
+        for (aid, _), (entities, locations, complete) in zip(missing, results):
+            stored[aid] = (entities, locations)
+            if complete:
+                new_results.append((aid, hashes[aid], entities, locations))
+        logger.info(f"Located {len(missing)} articles in {elapsed:.2f}s "
+                    f"({len(missing) / max(elapsed, 1e-9):.0f} articles/s, {mode} mode)")
+
+    location_store.put_many(new_results, store_path)
+    return [stored[aid][1] if aid in stored else [] for aid in ids]
+
+
+def throughput_report(df, modes=LOCATION_MODES):
+    """Articles per second of locate_texts in each mode (without the store)"""
+    texts = [article_text(t, s) for t, s in zip(df["Title"], df["Summary"])]
+    report = {"articles": len(texts)}
+    for mode in modes:
+        started = time.perf_counter()
+        results = locate_texts(texts, mode)
+        elapsed = time.perf_counter() - started
+        report[mode] = {
+            "seconds": round(elapsed, 3),
+            "articles_per_s": round(len(texts) / max(elapsed, 1e-9), 1),
+            "with_locations": sum(1 for _, locations, _ in results if locations),
+            "complete": all(done for _, _, done in results),
+        }
+    return report
+
+
+def join_locations(locations):
+    """Row form of matched locations (comma-separated, like operational_tag)"""
+    return ", ".join(locations)
+
+
+def split_locations(value):
+    if not isinstance(value, str) or not value:
+        return []
+    return value.split(", ")
+
+
+def get_location_data(df=None):
+    """
+    Fetch news articles from the live snapshot (or the given frame) and
+    extract location frequency data
     
     Returns:
         Dictionary with location data including coordinates, counts, and related news
     """
     # Reset counts and news list
-    location_data = {loc: {"lat": data["lat"], "lon": data["lon"], "count": 0, "news": []} 
+    location_data = {loc: {"name": loc, "lat": data["lat"], "lon": data["lon"], "count": 0, "news": []}
                      for loc, data in SRI_LANKA_LOCATIONS.items()}
     
-    if not os.path.exists(DATA_FILE):
-        logger.warning(f"Data file {DATA_FILE} not found.")
+    if df is None and not data_store.has_data():
+        logger.warning(f"Data file {data_store.data_path()} not found.")
         return location_data
         
     try:
-        df = pd.read_csv(DATA_FILE)
+        if df is None:
+            df = data_store.get_dataframe()
         logger.info(f"Loaded {len(df)} articles for location analysis")
     except Exception as e:
         logger.error(f"Error reading data file: {e}")
         return location_data
     
-    # Process each article (Title + Summary)
+    # Matched locations per article: written into the rows by the pipeline's
+    # locations stage, or extracted once per new or changed article
+    if "locations" in df.columns:
+        matches = [split_locations(value) for value in df["locations"]]
+    else:
+        matches = article_locations(df)
+
     processed = 0
-    for _, row in df.iterrows():
-        try:
-            text = str(row.get('Title', '')) + " " + str(row.get('Summary', ''))
-            article_info = {
-                "Title": row.get('Title'),
-                "Link": row.get('Link'),
-                "Source": row.get('Source'),
-                "Summary": row.get('Summary'),
-                "Date": row.get('Date')
-            }
-            
-            # Extract locations from this article
-            extracted_locations = extract_locations_from_text(text)
-            
-            # Find generic matches for this article
-            # We use a set to avoid adding the same article multiple times to the same location 
-            # (even if the location is mentioned multiple times in the text)
-            matched_locations_in_article = set()
-            
-            for extracted_loc in extracted_locations:
-                extracted_lower = extracted_loc.lower()
-                
-                for known_loc in SRI_LANKA_LOCATIONS.keys():
-                    known_lower = known_loc.lower()
-                    
-                    # Check for match (Exact or Substring)
-                    if known_lower == extracted_lower or \
-                       (known_lower in extracted_lower and len(extracted_lower) < len(known_lower) + 15):
-                        matched_locations_in_article.add(known_loc)
-            
-            # Update the global data with matches from this article
-            for loc in matched_locations_in_article:
+    for row, matched_locations_in_article in zip(df.to_dict(orient='records'), matches):
+        article_info = {
+            "Title": row.get('Title'),
+            "Link": row.get('Link'),
+            "Source": row.get('Source'),
+            "Summary": row.get('Summary'),
+            "Date": row.get('Date')
+        }
+        
+        # Update the global data with matches from this article
+        for loc in matched_locations_in_article:
+            if loc not in location_data:
+                # Not a known location: a geocoded place, keyed by name and coordinates
+                place = parse_place(loc)
+                if place is not None:
+                    location_data[loc] = {"name": place[0], "lat": place[1], "lon": place[2], "count": 0, "news": []}
+            if loc in location_data:
                 location_data[loc]["count"] += 1
                 location_data[loc]["news"].append(article_info)
-            
-            processed += 1
-            
-        except Exception as e:
-            logger.debug(f"Error processing row: {e}")
-            continue
+        
+        processed += 1
     
     logger.info(f"Processed {processed} articles for locations")
 
@@ -178,14 +396,14 @@ def get_location_data():
     return filtered_data
 
 
-def get_heatmap_data():
+def get_heatmap_data(df=None):
     """
     Get location data formatted for heatmap visualization
     
     Returns:
         List of [lat, lon, intensity] arrays for heatmap
     """
-    location_data = get_location_data()
+    location_data = get_location_data(df)
     
     # Convert to heatmap format: [lat, lon, intensity]
     heatmap_points = []
@@ -196,14 +414,14 @@ def get_heatmap_data():
     return heatmap_points
 
 
-def get_location_summary():
+def get_location_summary(df=None):
     """
     Get a summary of top locations mentioned in news
     
     Returns:
         Dictionary with location statistics
     """
-    location_data = get_location_data()
+    location_data = get_location_data(df)
     
     # Sort by count
     sorted_locations = sorted(
@@ -216,7 +434,7 @@ def get_location_summary():
         "total_locations": len(location_data),
         "top_locations": [
             {
-                "name": loc,
+                "name": data["name"],
                 "count": data["count"],
                 "lat": data["lat"],
                 "lon": data["lon"]
@@ -225,3 +443,20 @@ def get_location_summary():
         ],
         "all_locations": location_data
     }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Location extraction throughput per mode")
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    frame = data_store.load_frame(data_store.data_path()).head(args.rows)
+    report = throughput_report(frame)
+    print(f"{'mode':<12}{'seconds':>10}{'articles/s':>12}{'located':>10}")
+    for mode in LOCATION_MODES:
+        row = report[mode]
+        note = "" if row["complete"] else "  (spaCy model missing, NER skipped)"
+        print(f"{mode:<12}{row['seconds']:>10}{row['articles_per_s']:>12}{row['with_locations']:>10}{note}")
+    print(f"{report['articles']} articles")
@@ -3,6 +3,9 @@ import random
 import time
 import json
 import os
+import atexit
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 import logging
 
@@ -11,6 +14,15 @@ logger = logging.getLogger(__name__)
 PROXY_CONFIG_FILE = "data/proxy_config.json"
 PROXY_LOG_FILE = "data/proxy_rotation.log"
 
+# Rotation log: recent lines kept in memory, file rotated by size
+LOG_RING_SIZE = 500
+LOG_FLUSH_INTERVAL = 2  # seconds
+LOG_FLUSH_BATCH = 100  # lines; flush early when this many are queued
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# Larger unread growth (another process logging heavily) is tail-read instead
+LOG_MAX_CATCHUP_BYTES = 256 * 1024
+
 # Reliable GitHub lists for free HTTP/HTTPS proxies
 GITHUB_PROXY_SOURCES = [
     "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt",
@@ -28,8 +40,123 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15"
 ]
 
+def tail_lines(path, count, block_size=8192):
+    """Last `count` lines of a file, reading backwards from the end in blocks"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+    return lines[-count:]
+
+
+class RotationLog:
+    """
+    Proxy rotation events: a ring buffer of recent lines for the status API,
+    written to disk in batches by a background thread with size-based file
+    rotation. Lines appended by other processes are picked up from the file
+    tail, so every process shows the same log.
+    """
+
+    def __init__(self, path=PROXY_LOG_FILE, ring_size=LOG_RING_SIZE):
+        self.path = path
+        self._ring = deque(maxlen=ring_size)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+        self._inode = None
+        self._offset = 0
+        atexit.register(self.flush)
+
+    def append(self, line):
+        """Queue a line; it is visible immediately and written within LOG_FLUSH_INTERVAL"""
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= LOG_FLUSH_BATCH:
+                self._wake.set()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="proxy-log-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(LOG_FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write queued lines to the log file"""
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= LOG_MAX_BYTES:
+                    # Read what is left of the old file before it moves away
+                    self._sync()
+                    self._rotate_files()
+                with open(self.path, 'a') as f:
+                    f.write("".join(batch))
+            except Exception as e:
+                logger.error(f"Error writing proxy rotation log: {e}")
+                # Keep the lines visible rather than dropping them
+                self._ring.extend(batch)
+
+    def _rotate_files(self):
+        for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _sync(self):
+        """Bring the ring up to date with the file (a stat when nothing changed)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is None:
+            # Cold start: only the tail of the file is read
+            self._ring.extend(tail_lines(self.path, self._ring.maxlen))
+            self._inode, self._offset = st.st_ino, st.st_size
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # Rotated: the new file only holds lines we have not seen
+            self._inode, self._offset = st.st_ino, 0
+        if st.st_size == self._offset:
+            return
+        if st.st_size - self._offset > LOG_MAX_CATCHUP_BYTES:
+            self._ring.extend(tail_lines(self.path, self._ring.maxlen))
+            self._offset = st.st_size
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        self._ring.extend(chunk[:end].decode('utf-8', errors='replace').splitlines(keepends=True))
+        self._offset += end
+
+    def recent(self, count=50):
+        """Most recent lines, oldest first"""
+        with self._lock:
+            try:
+                self._sync()
+            except Exception as e:
+                logger.error(f"Error reading proxy logs: {e}")
+            lines = list(self._ring)[-count:] + self._pending
+        return lines[-count:]
+
+
 class ProxyManager:
     def __init__(self):
+        self.rotation_log = RotationLog()
         self.config = self.load_config()
         self.current_proxy = None
         self.last_rotation = None
@@ -81,13 +208,11 @@ class ProxyManager:
     def log_rotation(self, reason, proxy=None):
         """Log proxy rotation event"""
         try:
-            os.makedirs(os.path.dirname(PROXY_LOG_FILE), exist_ok=True)
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             proxy_str = proxy if proxy else "None"
             log_entry = f"[{timestamp}] {reason} | Proxy: {proxy_str}\n"
             
-            with open(PROXY_LOG_FILE, 'a') as f:
-                f.write(log_entry)
+            self.rotation_log.append(log_entry)
             
             logger.info(f"Proxy rotation: {reason}")
         except Exception as e:
@@ -270,15 +395,6 @@ class ProxyManager:
     
     def get_recent_logs(self, lines=50):
         """Get recent proxy rotation logs"""
-        if not os.path.exists(PROXY_LOG_FILE):
-            return []
-        
-        try:
-            with open(PROXY_LOG_FILE, 'r') as f:
-                all_lines = f.readlines()
-                return all_lines[-lines:]
-        except Exception as e:
-            logger.error(f"Error reading proxy logs: {e}")
-            return []
+        return self.rotation_log.recent(lines)
 
 proxy_manager = ProxyManager()
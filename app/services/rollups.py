@@ -0,0 +1,184 @@
+"""
+Incrementally maintained trend counts.
+
+Each pipeline run adds the articles it has not counted before to three rollup
+tables in data/trends.db: per hour and operational tag, per hour and impact
+level, and per day, source and impact level. Counted article IDs are kept, so
+articles that come back after a rollback are not counted twice. /api/trends
+reads these tables, so charting a month never touches raw articles.
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRENDS_DB = os.path.join("data", "trends.db")
+
+# Buckets use local time, like the archive partitions
+LOCAL_TZ = "Asia/Colombo"
+
+# series name -> (table, bucket column, key column)
+SERIES = {
+    "tag": ("tag_hourly", "hour", "operational_tag"),
+    "impact": ("impact_hourly", "hour", "impact_level"),
+    "source": ("source_daily", "day", "Source"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tag_hourly (
+    hour TEXT NOT NULL, operational_tag TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (hour, operational_tag)
+);
+CREATE TABLE IF NOT EXISTS impact_hourly (
+    hour TEXT NOT NULL, impact_level TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (hour, impact_level)
+);
+CREATE TABLE IF NOT EXISTS source_daily (
+    day TEXT NOT NULL, Source TEXT NOT NULL, impact_level TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (day, Source, impact_level)
+);
+CREATE TABLE IF NOT EXISTS applied_versions (version INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS counted_articles (article_id TEXT PRIMARY KEY);
+"""
+
+# IDs per "IN (...)" lookup, under SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+# One read connection per thread (sqlite3 connections are not shared across threads)
+_local = threading.local()
+
+
+def connect(path=TRENDS_DB):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _reader(path):
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    if path not in conns:
+        conns[path] = connect(path)
+    return conns[path]
+
+
+def _counted(conn, ids):
+    """The IDs among ids that are already in the rollups"""
+    found = set()
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[i:i + LOOKUP_CHUNK]
+        sql = f"SELECT article_id FROM counted_articles WHERE article_id IN ({', '.join('?' * len(chunk))})"
+        found.update(row[0] for row in conn.execute(sql, chunk))
+    return found
+
+
+def _bucketed(df):
+    """Hour and day buckets of each article (fetch time when Published is unparsable)"""
+    published = pd.to_datetime(df["Published"], utc=True, errors='coerce', format='mixed')
+    published = published.fillna(pd.Timestamp.now(tz="UTC")).dt.tz_convert(LOCAL_TZ)
+    return published.dt.strftime("%Y-%m-%dT%H:00"), published.dt.strftime("%Y-%m-%d")
+
+
+def count_rollups(df):
+    """The three rollups of a frame as {series: {key tuple: count}}"""
+    if df.empty:
+        return {name: {} for name in SERIES}
+    hours, days = _bucketed(df)
+    impact = df["impact_level"].astype(str)
+
+    tags = df["operational_tag"].astype(str).str.split(', ')
+    tag_frame = pd.DataFrame({"hour": hours, "tag": tags}).explode("tag")
+    return {
+        "tag": tag_frame.groupby(["hour", "tag"]).size().to_dict(),
+        "impact": pd.DataFrame({"hour": hours, "impact": impact}).groupby(["hour", "impact"]).size().to_dict(),
+        "source": pd.DataFrame({"day": days, "source": df["Source"].astype(str), "impact": impact})
+                  .groupby(["day", "source", "impact"]).size().to_dict(),
+    }
+
+
+def apply_run(df, inserted_ids, version, path=TRENDS_DB):
+    """
+    Add a run's articles that are not counted yet to the rollups. Applying the
+    same version twice is a no-op, and an article is only ever counted once.
+    """
+    conn = connect(path)
+    try:
+        if conn.execute("SELECT 1 FROM applied_versions WHERE version = ?", (version,)).fetchone():
+            return 0
+        first_run = conn.execute("SELECT 1 FROM applied_versions LIMIT 1").fetchone() is None
+        ids = df["article_id"].astype(str).tolist()
+        if not first_run and conn.execute("SELECT 1 FROM counted_articles LIMIT 1").fetchone() is None:
+            # Rollups from before IDs were kept: everything but this run's inserts is counted
+            inserted = set(inserted_ids)
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO counted_articles (article_id) VALUES (?)",
+                                 [(aid,) for aid in ids if aid not in inserted])
+        counted = _counted(conn, ids)
+        rows = df[[aid not in counted for aid in ids]]
+        counts = count_rollups(rows)
+
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO counted_articles (article_id) VALUES (?)",
+                             [(aid,) for aid in rows["article_id"].astype(str)])
+            for name, (table, bucket, key) in SERIES.items():
+                columns = [bucket, key] + (["impact_level"] if name == "source" else [])
+                sql = (f"INSERT INTO {table} ({', '.join(columns)}, count) "
+                       f"VALUES ({', '.join('?' * (len(columns) + 1))}) "
+                       f"ON CONFLICT ({', '.join(columns)}) DO UPDATE SET count = count + excluded.count")
+                conn.executemany(sql, [(*k, int(n)) for k, n in counts[name].items()])
+            conn.execute("INSERT INTO applied_versions (version) VALUES (?)", (version,))
+        logger.info(f"Trends: added {len(rows)} articles from version {version}")
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def query(series, since=None, until=None, keys=None, impact_level=None, resolution=None, path=TRENDS_DB):
+    """
+    Rows of one rollup between since and until (inclusive, compared as ISO
+    strings). resolution="day" sums hourly series per day.
+    """
+    if series not in SERIES:
+        raise ValueError(f"series must be one of {', '.join(SERIES)}")
+    if resolution not in (None, "hour", "day"):
+        raise ValueError("resolution must be hour or day")
+    table, bucket, key = SERIES[series]
+    if resolution == "hour" and bucket == "day":
+        raise ValueError("source trends are daily")
+    if not os.path.exists(path):
+        return []
+
+    bucket_expr = f"substr({bucket}, 1, 10)" if resolution == "day" and bucket == "hour" else bucket
+    out_name = "day" if resolution == "day" else bucket
+    where, params = [], []
+    if since:
+        where.append(f"{bucket} >= ?")
+        params.append(since)
+    if until:
+        # A bare date includes the whole day
+        where.append(f"{bucket} <= ?")
+        params.append(until + "T23:59" if len(until) == 10 and bucket == "hour" else until)
+    if keys:
+        where.append(f"{key} IN ({', '.join('?' * len(keys))})")
+        params.extend(keys)
+    group = [bucket_expr, key]
+    if series == "source":
+        if impact_level:
+            where.append("impact_level IN ({})".format(", ".join('?' * len(impact_level))))
+            params.extend(impact_level)
+        else:
+            group.append("impact_level")
+
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    columns = [f"{bucket_expr} AS {out_name}", key] + group[2:]
+    sql = (f"SELECT {', '.join(columns)}, SUM(count) AS count FROM {table} {clause} "
+           f"GROUP BY {', '.join(group)} ORDER BY 1, 2")
+    return [dict(row) for row in _reader(path).execute(sql, params)]
@@ -0,0 +1,185 @@
+"""
+Full-text search over article titles and summaries.
+
+Articles are kept in a SQLite database (data/search.db) with an FTS5 index
+on Title and Summary. The pipeline upserts only the articles a run inserted
+or changed, so the index keeps growing with history instead of being rebuilt.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import logging
+import pandas as pd
+from app.services import data_query
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DB = os.path.join("data", "search.db")
+
+# Columns stored alongside the index and returned by /api/search
+STORED_COLUMNS = [
+    "article_id", "Source", "Title", "Summary", "Link", "Published",
+    "impact_level", "impact_score", "operational_tag", "event_flag",
+]
+
+# bm25 weights for (Title, Summary): title hits rank higher
+TITLE_WEIGHT = 10.0
+SUMMARY_WEIGHT = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    article_id TEXT NOT NULL UNIQUE,
+    Source TEXT,
+    Title TEXT,
+    Summary TEXT,
+    Link TEXT,
+    Published TEXT,
+    published_ns INTEGER,
+    impact_level TEXT,
+    impact_score REAL,
+    operational_tag TEXT,
+    event_flag TEXT
+);
+CREATE INDEX IF NOT EXISTS articles_published ON articles(published_ns);
+CREATE INDEX IF NOT EXISTS articles_source ON articles(Source);
+CREATE INDEX IF NOT EXISTS articles_impact ON articles(impact_level);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    Title, Summary, content='articles', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, Title, Summary) VALUES (new.id, new.Title, new.Summary);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, Title, Summary) VALUES ('delete', old.id, old.Title, old.Summary);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, Title, Summary) VALUES ('delete', old.id, old.Title, old.Summary);
+    INSERT INTO articles_fts(rowid, Title, Summary) VALUES (new.id, new.Title, new.Summary);
+END;
+"""
+
+# One read connection per thread (sqlite3 connections are not shared across threads)
+_local = threading.local()
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def connect(path=SEARCH_DB):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets web workers read while the pipeline writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _reader(path):
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    if path not in conns:
+        conns[path] = connect(path)
+    return conns[path]
+
+
+def _rows(df):
+    published = pd.to_datetime(df["Published"], utc=True, errors='coerce', format='mixed')
+    published_ns = [None if pd.isna(ts) else ts.value for ts in published]
+    frame = df.reindex(columns=STORED_COLUMNS)
+    frame = frame.astype(object).where(pd.notnull(frame), None)
+    for values, ns in zip(frame.itertuples(index=False, name=None), published_ns):
+        record = dict(zip(STORED_COLUMNS, values))
+        if record["impact_score"] is not None:
+            record["impact_score"] = float(record["impact_score"])
+        record["published_ns"] = ns
+        yield record
+
+
+def upsert(df, article_ids=None, path=SEARCH_DB):
+    """
+    Index the given articles of df (all of them when article_ids is None, or
+    when the index is still empty). Returns the number of rows written.
+    """
+    columns = STORED_COLUMNS + ["published_ns"]
+    placeholders = ", ".join(f":{c}" for c in columns)
+    updates = ", ".join(f"{c}=excluded.{c}" for c in columns if c != "article_id")
+    sql = (f"INSERT INTO articles ({', '.join(columns)}) VALUES ({placeholders}) "
+           f"ON CONFLICT(article_id) DO UPDATE SET {updates}")
+
+    conn = connect(path)
+    try:
+        empty = conn.execute("SELECT 1 FROM articles LIMIT 1").fetchone() is None
+        if article_ids is not None and not empty:
+            df = df[df["article_id"].isin(article_ids)]
+        if df.empty:
+            return 0
+        with conn:
+            conn.executemany(sql, _rows(df))
+        logger.info(f"Search index: upserted {len(df)} articles")
+        return len(df)
+    finally:
+        conn.close()
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, and the last
+    word also matches as a prefix (search-as-you-type).
+    """
+    words = _TOKEN.findall(text)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+def search(args, path=SEARCH_DB):
+    """
+    Run /api/search: q (required), impact_level, source (comma-separated),
+    since, until, page, limit. Returns (rows, total, page, limit); raises
+    ValueError on bad parameters.
+    """
+    expression = match_expression(args.get("q", ""))
+    if expression is None:
+        raise ValueError("q must contain at least one word")
+
+    where = ["articles_fts MATCH ?"]
+    params = [expression]
+    for param, column in (("impact_level", "impact_level"), ("source", "Source")):
+        wanted = [v.strip() for v in args.get(param, "").split(',') if v.strip()]
+        if wanted:
+            where.append(f"a.{column} IN ({', '.join('?' * len(wanted))})")
+            params.extend(wanted)
+    since = data_query._parse_time(args.get("since"))
+    until = data_query._parse_time(args.get("until"))
+    if since is not None:
+        where.append("a.published_ns >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("a.published_ns <= ?")
+        params.append(until)
+
+    page = data_query._parse_int(args.get("page"), "page", 1)
+    limit = data_query._parse_int(args.get("limit"), "limit", data_query.DEFAULT_PAGE_SIZE,
+                                  maximum=data_query.MAX_PAGE_SIZE)
+
+    if not os.path.exists(path):
+        return [], 0, page, limit
+
+    conn = _reader(path)
+    clause = " AND ".join(where)
+    base = f"FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid WHERE {clause}"
+    total = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT {', '.join('a.' + c for c in STORED_COLUMNS)}, "
+        f"bm25(articles_fts, {TITLE_WEIGHT}, {SUMMARY_WEIGHT}) AS rank "
+        f"{base} ORDER BY rank LIMIT ? OFFSET ?",
+        params + [limit, (page - 1) * limit],
+    ).fetchall()
+    return [dict(row) for row in rows], total, page, limit
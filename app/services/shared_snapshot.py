@@ -0,0 +1,162 @@
+"""
+Shared-memory publication of the live snapshot for multi-worker deployments.
+
+When SIGNALS_SHM_DIR is set (for example /dev/shm/news_signals), the pipeline
+writes the processed frame as an uncompressed Arrow IPC file plus the
+pre-encoded API bodies into that directory, then flips a small pointer file.
+Every web worker memory-maps the same files read-only, so resident memory does
+not grow with the number of workers and workers never need the NLP models.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SHM_DIR = os.environ.get("SIGNALS_SHM_DIR")
+POINTER_NAME = "current.json"
+
+# Older versions stay mapped by slow workers until they switch over
+KEEP_VERSIONS = 2
+
+_opened = None  # (pointer key, SharedSnapshot)
+_open_lock = threading.Lock()
+
+
+def enabled():
+    return bool(SHM_DIR) and pa is not None
+
+
+def _pointer_path():
+    return os.path.join(SHM_DIR, POINTER_NAME)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def publish(table, version, bodies=None):
+    """
+    Publish an Arrow table and its encoded bodies ({name: {encoding: bytes}})
+    as the current shared snapshot.
+    """
+    os.makedirs(SHM_DIR, exist_ok=True)
+    prefix = f"v{version:06d}"
+
+    table_name = f"{prefix}.arrow"
+    tmp_path = os.path.join(SHM_DIR, f"{table_name}.tmp")
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, os.path.join(SHM_DIR, table_name))
+
+    body_files = {}
+    for name, variants in (bodies or {}).items():
+        for encoding, data in variants.items():
+            file_name = f"{prefix}.{name}.{encoding}"
+            _write_atomic(os.path.join(SHM_DIR, file_name), data)
+            body_files.setdefault(name, {})[encoding] = file_name
+
+    pointer = {
+        "version": version,
+        "table": table_name,
+        "bodies": body_files,
+        "published_at": time.time()
+    }
+    _write_atomic(_pointer_path(), json.dumps(pointer).encode('utf-8'))
+    _prune(version)
+    logger.info(f"Published version {version} to shared memory at {SHM_DIR}")
+
+
+def publish_frame(df, version):
+    """Map a version and its pre-encoded API bodies into shared memory"""
+    from app.http_cache import EncodedBody
+    from app.services import data_store, snapshot_format
+    from app.services.nlp_service import get_location_summary
+
+    records = data_store.frame_records(df)
+    bodies = {
+        "data": EncodedBody(records, None).variants,
+        "changes-full": EncodedBody({"version": version, "full": True, "items": records}, None).variants,
+    }
+    try:
+        # Web workers then serve the map without loading spaCy themselves
+        bodies["locations"] = EncodedBody(get_location_summary(df), None).variants
+    except Exception as e:
+        logger.warning(f"Location summary not precomputed for shared memory: {e}")
+    publish(snapshot_format.to_arrow_table(df), version, bodies)
+
+
+def _prune(live_version):
+    """Unlink files of old versions; workers that still map them keep their pages"""
+    for name in os.listdir(SHM_DIR):
+        if not name.startswith("v") or name.endswith(".tmp"):
+            continue
+        try:
+            version = int(name[1:7])
+        except ValueError:
+            continue
+        if version <= live_version - KEEP_VERSIONS:
+            try:
+                os.unlink(os.path.join(SHM_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+def pointer_key():
+    """(mtime_ns, size) of the pointer file, or None if nothing is published"""
+    if not enabled():
+        return None
+    try:
+        st = os.stat(_pointer_path())
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class SharedSnapshot:
+    """Read-only, memory-mapped view of one published version"""
+
+    def __init__(self, pointer):
+        self.version = int(pointer["version"])
+        source = pa.memory_map(os.path.join(SHM_DIR, pointer["table"]), 'r')
+        # Zero-copy: column buffers point straight into the mapped file
+        self.table = pa.ipc.open_file(source).read_all()
+        self.bodies = {}
+        for name, variants in pointer.get("bodies", {}).items():
+            self.bodies[name] = {
+                encoding: pa.memory_map(os.path.join(SHM_DIR, file_name), 'r').read_buffer()
+                for encoding, file_name in variants.items()
+            }
+
+
+def open_current():
+    """The live shared snapshot, re-mapped only when the pointer changes"""
+    global _opened
+    key = pointer_key()
+    if key is None:
+        return None
+    opened = _opened
+    if opened is not None and opened[0] == key:
+        return opened[1]
+    with _open_lock:
+        opened = _opened
+        if opened is not None and opened[0] == key:
+            return opened[1]
+        with open(_pointer_path(), 'rb') as f:
+            pointer = json.loads(f.read())
+        shared = SharedSnapshot(pointer)
+        _opened = (key, shared)
+        logger.info(f"Mapped shared snapshot version {shared.version}")
+        return shared
@@ -0,0 +1,171 @@
+"""
+Columnar (Parquet) storage for processed article snapshots.
+Explicit column types avoid re-inferring dtypes on every read, and readers can
+load only the columns they need. Pages are zstd-compressed, so every read
+decodes onto the heap; zero-copy mapping is what the shared-memory Arrow copy
+(shared_snapshot) is for.
+"""
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+PARQUET_NAME = "final_data.parquet"
+CSV_NAME = "final_data.csv"
+
+# Column -> Arrow type for the processed frame written by run_pipeline
+ARTICLE_COLUMNS = {
+    "article_id": "string",
+    "Source": "string",
+    "Title": "string",
+    "Link": "string",
+    "Summary": "string",
+    "Published": "string",
+    "SEO_Score": "float64",
+    "cleaned": "string",
+    "topic_cluster": "int32",
+    "sentiment_score": "float64",
+    "lexicon_score": "float64",
+    "impact_score": "float64",
+    "impact_level": "string",
+    "operational_tag": "string",
+    "event_flag": "string",
+    "cluster_name": "string",
+    "locations": "string",
+}
+
+
+# Compact in-memory schema for the serving copy held by the API read model
+CATEGORICAL_COLUMNS = ["Source", "impact_level", "operational_tag", "event_flag", "cluster_name"]
+FLOAT32_COLUMNS = ["SEO_Score", "sentiment_score", "lexicon_score", "impact_score"]
+CLUSTER_ID_DTYPE = "int16"
+
+# The cleaned text is only needed by the pipeline; serving can drop it
+SERVING_DROP_CLEANED = os.environ.get("SIGNALS_DROP_CLEANED", "0") == "1"
+
+
+def available():
+    return pa is not None
+
+
+def _arrow_type(name):
+    return {"string": pa.string(), "float64": pa.float64(), "int32": pa.int32()}[name]
+
+
+def to_arrow_table(df):
+    """Convert a processed frame to an Arrow table with the declared column types"""
+    fields = []
+    for column in df.columns:
+        declared = ARTICLE_COLUMNS.get(column)
+        if declared is None:
+            # Unknown extra columns keep their inferred type
+            fields.append(pa.field(column, pa.Array.from_pandas(df[column]).type))
+        else:
+            fields.append(pa.field(column, _arrow_type(declared)))
+
+    arrays = []
+    for field in fields:
+        series = df[field.name]
+        if pa.types.is_string(field.type):
+            series = series.astype(object).where(series.notna(), None)
+            series = series.map(lambda v: v if v is None else str(v))
+        arrays.append(pa.array(series, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def write_parquet(df, path):
+    pq.write_table(to_arrow_table(df), path, compression="zstd")
+
+
+def read_parquet(path, columns=None):
+    """Read the requested columns of a Parquet snapshot as a DataFrame"""
+    if columns is not None:
+        present = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in present]
+    table = pq.read_table(path, columns=columns)
+    return table.to_pandas()
+
+
+def read_frame(path, columns=None):
+    """Read a snapshot file in either format, optionally only some columns"""
+    if path.endswith(".parquet"):
+        return read_parquet(path, columns)
+    if columns is not None:
+        header = pd.read_csv(path, nrows=0).columns
+        return pd.read_csv(path, usecols=[c for c in columns if c in header])
+    return pd.read_csv(path)
+
+
+def compact_frame(df, drop_cleaned=None):
+    """
+    Serving copy of a processed frame: categoricals for low-cardinality text,
+    float32 scores, small integer cluster IDs and optionally no `cleaned`.
+    """
+    if drop_cleaned is None:
+        drop_cleaned = SERVING_DROP_CLEANED
+    df = df.drop(columns=["cleaned"]) if drop_cleaned and "cleaned" in df else df.copy()
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    for column in FLOAT32_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+    if "topic_cluster" in df:
+        df["topic_cluster"] = pd.to_numeric(df["topic_cluster"], errors="coerce").fillna(-1).astype(CLUSTER_ID_DTYPE)
+    return df
+
+
+def synthetic_archive(df, rows):
+    """Resample a processed frame to `rows` rows with unique IDs and links"""
+    sample = df.sample(n=rows, replace=True, random_state=42).reset_index(drop=True)
+    suffix = pd.Series(np.arange(rows)).astype(str)
+    if "article_id" in sample:
+        sample["article_id"] = sample["article_id"].astype(str) + "-" + suffix
+    if "Link" in sample:
+        sample["Link"] = sample["Link"].astype(str) + "#" + suffix
+    return sample
+
+
+def memory_report(df, rows=100_000):
+    """Compare the deep memory footprint of the plain and compact serving frames"""
+    archive = synthetic_archive(df, rows)
+    # Match what a CSV read produces: plain Python object strings
+    plain = archive.astype({c: object for c in archive.columns if archive[c].dtype != np.float64
+                            and not pd.api.types.is_integer_dtype(archive[c])})
+    report = {"rows": rows}
+    for label, frame in [("plain", plain),
+                         ("compact", compact_frame(plain, drop_cleaned=False)),
+                         ("compact_no_cleaned", compact_frame(plain, drop_cleaned=True))]:
+        per_column = frame.memory_usage(deep=True, index=False)
+        report[label] = {
+            "total_mb": round(per_column.sum() / 2**20, 1),
+            "columns_mb": {c: round(v / 2**20, 2) for c, v in per_column.items()}
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.services import data_store
+
+    parser = argparse.ArgumentParser(description="Memory footprint of the serving frame")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    source = data_store.load_frame(data_store.data_path())
+    report = memory_report(source, args.rows)
+    print(f"{'column':<18}{'plain MB':>10}{'compact MB':>12}")
+    for column, plain_mb in report["plain"]["columns_mb"].items():
+        print(f"{column:<18}{plain_mb:>10.2f}{report['compact']['columns_mb'].get(column, 0):>12.2f}")
+    for label in ("plain", "compact", "compact_no_cleaned"):
+        print(f"{label:<18} total {report[label]['total_mb']} MB for {report['rows']} rows")
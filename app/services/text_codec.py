@@ -0,0 +1,142 @@
+"""
+Dictionary compression for archived text.
+
+Summaries and raw feed payloads repeat the same boilerplate run after run, so
+each (kind, source) pair gets a preset dictionary trained from its own text.
+zstandard dictionaries are used when the package is installed, otherwise
+zlib with a zdict. Dictionaries are immutable files named by content hash, so
+anything compressed with an older dictionary stays readable after retraining.
+"""
+
+import os
+import re
+import zlib
+import time
+import hashlib
+import threading
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DICT_DIR = os.path.join("data", "archive", "_dicts")
+
+# zlib only uses the last 32 KiB of a preset dictionary
+DICT_SIZE = 32 * 1024
+# Dictionaries are retrained from fresh samples after this long
+DICT_MAX_AGE = 7 * 24 * 3600
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 12
+
+NO_DICT = "none"
+
+_lock = threading.Lock()
+# dict id -> bytes
+_loaded = {}
+
+
+def slug(source):
+    """File-name-safe form of a source name"""
+    return re.sub(r"[^a-z0-9]+", "-", str(source).lower()).strip("-") or "unknown"
+
+
+def _codec():
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _dict_dir(data_dir):
+    return os.path.join(data_dir, "archive", "_dicts")
+
+
+def _train(samples):
+    """Dictionary bytes from sample texts (most recent samples weigh most for zlib)"""
+    samples = [s for s in samples if s]
+    if zstandard is not None and len(samples) >= 8:
+        try:
+            return zstandard.train_dictionary(DICT_SIZE, samples).as_bytes()
+        except zstandard.ZstdError:
+            pass
+    # zlib matches against the end of the dictionary first; keep the newest text last
+    return b"\n".join(samples)[-DICT_SIZE:]
+
+
+def current_dict(kind, source, samples=(), data_dir="data"):
+    """
+    ID of the dictionary to compress new `kind` text from `source` with,
+    training one from samples when none exists or the current one is stale.
+    Returns NO_DICT when there is nothing to train from.
+    """
+    prefix = f"{_codec()}-{kind}-{slug(source)}-"
+    directory = _dict_dir(data_dir)
+    with _lock:
+        existing = []
+        if os.path.isdir(directory):
+            existing = [
+                entry for entry in os.scandir(directory)
+                if entry.name.startswith(prefix) and entry.name.endswith(".dict")
+            ]
+        if existing:
+            newest = max(existing, key=lambda entry: entry.stat().st_mtime)
+            if time.time() - newest.stat().st_mtime < DICT_MAX_AGE or not samples:
+                return newest.name[:-len(".dict")]
+        data = _train(list(samples))
+        if not data:
+            return NO_DICT
+        dict_id = prefix + hashlib.sha1(data).hexdigest()[:12]
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{dict_id}.dict")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            logger.info(f"Trained {kind} dictionary for {source} ({len(data)} bytes)")
+        _loaded[dict_id] = data
+        return dict_id
+
+
+def _dict_bytes(dict_id, data_dir):
+    if dict_id == NO_DICT:
+        return b""
+    data = _loaded.get(dict_id)
+    if data is None:
+        with open(os.path.join(_dict_dir(data_dir), f"{dict_id}.dict"), 'rb') as f:
+            data = f.read()
+        _loaded[dict_id] = data
+    return data
+
+
+def compress(data, dict_id, data_dir="data"):
+    """Compress bytes with a dictionary ID from current_dict (or NO_DICT)"""
+    zdict = _dict_bytes(dict_id, data_dir)
+    if dict_id.startswith("zstd-"):
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zstandard.ZstdCompressionDict(zdict))
+        return compressor.compress(data)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zdict=zdict) if zdict else zlib.compressobj(ZLIB_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(blob, dict_id, data_dir="data"):
+    zdict = _dict_bytes(dict_id, data_dir)
+    if dict_id.startswith("zstd-"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archive")
+        return zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(zdict)).decompress(blob)
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(blob) + decompressor.flush()
+
+
+def compress_text(text, dict_id, data_dir="data"):
+    if text is None:
+        return None
+    return compress(str(text).encode('utf-8'), dict_id, data_dir)
+
+
+def decompress_text(blob, dict_id, data_dir="data"):
+    if blob is None:
+        return None
+    return decompress(blob, dict_id, data_dir).decode('utf-8')
@@ -0,0 +1,405 @@
+"""
+Versioned snapshot publication.
+
+Every pipeline run is written as an immutable generation directory
+(data/snapshots/v000042/) and made live by atomically replacing the
+data/current.json pointer, so readers never see a partial write and a bad run
+can be rolled back. A change log of inserted, updated and removed article IDs
+per version backs /api/data/changes.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes are only serialised within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = os.path.join("data", "current.json")
+CHANGELOG_FILE = os.path.join("data", "changelog.jsonl")
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+
+# Number of versions a client can lag behind and still get a delta
+CHANGELOG_RETENTION = 200
+
+# Number of published generations kept on disk for rollback
+SNAPSHOT_RETENTION = 5
+
+_changelog_cache = None  # (file key, entries)
+_changelog_lock = threading.Lock()
+
+_current_cache = None  # (file key, pointer)
+
+# Lock files under the data directory
+PIPELINE_LOCK = "pipeline.lock"
+PUBLISH_LOCK = "publish.lock"
+_file_locks = {}  # lock name -> (re-entrant thread lock, [hold depth])
+_file_locks_lock = threading.Lock()
+
+# Per-run labels: KMeans renumbers clusters and TF-IDF renames them on every
+# run, so they would mark nearly every carried-over article as updated
+RUN_LABEL_COLUMNS = ["topic_cluster", "cluster_name", "event_flag"]
+
+
+def make_article_id(source, link, title=""):
+    """Stable ID for an article: its source plus link (title if there is no link)"""
+    key = f"{source}|{link or title}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def article_ids(df):
+    if df.empty:
+        return pd.Series([], dtype=object, index=df.index)
+    return pd.Series(
+        [make_article_id(s, l, t) for s, l, t in zip(df["Source"], df["Link"].fillna(""), df["Title"])],
+        index=df.index
+    )
+
+
+def row_hashes(df):
+    """
+    Content hash per article, keyed by article_id. Values are hashed in their
+    CSV text form so a freshly processed frame compares equal to one read back
+    from disk. Run labels are left out; they are shipped by run_labels.
+    """
+    if df.empty:
+        return {}
+    cols = [c for c in df.columns if c != "article_id" and c not in RUN_LABEL_COLUMNS]
+    hashes = pd.util.hash_pandas_object(df[cols].astype(str), index=False)
+    return dict(zip(df["article_id"], hashes))
+
+
+def run_labels(df):
+    """
+    The run's cluster labels as a small map: each article's topic_cluster and
+    each cluster's name and event flag. Sent with deltas in place of updating
+    every article whose cluster was renumbered.
+    """
+    labels = {"clusters": {}, "topic_cluster": {}}
+    if df.empty or "topic_cluster" not in df:
+        return labels
+    clusters = pd.to_numeric(df["topic_cluster"], errors='coerce')
+    known = clusters.notna()
+    ids = df["article_id"][known].astype(str).tolist()
+    labels["topic_cluster"] = dict(zip(ids, clusters[known].astype(int).tolist()))
+    per_cluster = df[known].assign(topic_cluster=clusters[known].astype(int)).drop_duplicates("topic_cluster")
+    for _, row in per_cluster.iterrows():
+        labels["clusters"][str(row["topic_cluster"])] = {
+            c: (None if pd.isna(row[c]) else str(row[c])) for c in ("cluster_name", "event_flag") if c in df
+        }
+    return labels
+
+
+def diff_frames(previous, current):
+    """Article IDs inserted, updated and removed going from previous to current"""
+    old = row_hashes(previous)
+    new = row_hashes(current)
+    inserted = [aid for aid in new if aid not in old]
+    updated = [aid for aid, h in new.items() if aid in old and old[aid] != h]
+    removed = [aid for aid in old if aid not in new]
+    return {"inserted": inserted, "updated": updated, "removed": removed}
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_current(path=CURRENT_FILE):
+    """The published pointer ({} before the first versioned run), cached by mtime"""
+    global _current_cache
+    key = _file_key(path)
+    if key is None:
+        return {}
+    cached = _current_cache
+    if cached is not None and cached[0] == (path, key):
+        return cached[1]
+    try:
+        with open(path, 'r') as f:
+            pointer = json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading {path}: {e}")
+        return {}
+    _current_cache = ((path, key), pointer)
+    return pointer
+
+
+def current_version(path=CURRENT_FILE):
+    return int(read_current(path).get("version", 0))
+
+
+def pointer_sequence(pointer):
+    """
+    Number of times the pointer has moved (publishes plus rollbacks). Pointers
+    written before it was tracked count their published versions.
+    """
+    return int(pointer.get("sequence", pointer.get("last_version", pointer.get("version", 0))))
+
+
+def generation_name(version):
+    return f"v{version:06d}"
+
+
+def current_file(name, data_dir="data"):
+    """
+    Path of a file inside the live generation, or None before the first
+    versioned run.
+    """
+    pointer = read_current(os.path.join(data_dir, "current.json"))
+    if not pointer.get("path"):
+        return None
+    return os.path.join(data_dir, pointer["path"], name)
+
+
+@contextmanager
+def file_lock(name, data_dir="data"):
+    """
+    Hold data/<name> exclusively: a thread lock within this process and an
+    flock across processes (scheduler, web workers). Re-entrant in one thread.
+    """
+    with _file_locks_lock:
+        lock, depth = _file_locks.setdefault(name, (threading.RLock(), [0]))
+    with lock:
+        depth[0] += 1
+        try:
+            if depth[0] > 1 or fcntl is None:
+                yield
+                return
+            os.makedirs(data_dir, exist_ok=True)
+            with open(os.path.join(data_dir, name), 'w') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        finally:
+            depth[0] -= 1
+
+
+def write_atomic(path, writer):
+    """Write a file via writer(tmp_path) and rename it over path"""
+    tmp_path = f"{path}.tmp"
+    writer(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def list_generations(data_dir="data"):
+    """Versions of the generations still on disk, oldest first"""
+    snapshots_dir = os.path.join(data_dir, "snapshots")
+    if not os.path.isdir(snapshots_dir):
+        return []
+    versions = []
+    for name in os.listdir(snapshots_dir):
+        if name.startswith("v") and name[1:].isdigit():
+            versions.append(int(name[1:]))
+    return sorted(versions)
+
+
+def publish_snapshot(previous, current, files, data_dir="data", meta=None):
+    """
+    Publish a run as a new generation.
+
+    files maps file names to writer callables taking a path; each is written
+    into a temporary directory that is renamed into place before the pointer
+    flips. Publishes and rollbacks hold the publish lock, so two of them never
+    pick the same version. Returns (version, changes).
+    """
+    with file_lock(PUBLISH_LOCK, data_dir):
+        return _publish_snapshot(previous, current, files, data_dir, meta)
+
+
+def _publish_snapshot(previous, current, files, data_dir, meta):
+    current_path = os.path.join(data_dir, "current.json")
+    snapshots_dir = os.path.join(data_dir, "snapshots")
+    os.makedirs(snapshots_dir, exist_ok=True)
+
+    pointer = read_current(current_path)
+    base = int(pointer.get("version", 0))
+    # Versions keep increasing after a rollback; last_version tracks the highest issued
+    version = int(pointer.get("last_version", base)) + 1
+    sequence = pointer_sequence(pointer) + 1
+    changes = diff_frames(previous, current)
+
+    name = generation_name(version)
+    tmp_dir = os.path.join(snapshots_dir, f".tmp-{name}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for file_name, writer in files.items():
+        writer(os.path.join(tmp_dir, file_name))
+    target_dir = os.path.join(snapshots_dir, name)
+    if os.path.exists(target_dir):
+        # Left by a run that crashed before the pointer flip; it never went live
+        logger.warning(f"Removing orphaned generation {name}")
+        shutil.rmtree(target_dir)
+    os.rename(tmp_dir, target_dir)
+
+    published_at = time.time()
+    _write_json_atomic(current_path, {
+        "version": version,
+        "last_version": version,
+        "previous_version": base,
+        "sequence": sequence,
+        "path": os.path.join("snapshots", name),
+        "published_at": published_at,
+        "articles": int(len(current)),
+        **(meta or {})
+    })
+
+    # Only versions that went live are logged; a crash before this line just
+    # sends clients the full snapshot for this version
+    entry = {"version": version, "base": base, "published_at": published_at, **changes}
+    changelog_path = os.path.join(data_dir, "changelog.jsonl")
+    with open(changelog_path, 'a') as f:
+        f.write(json.dumps(entry) + "\n")
+    _trim_changelog(changelog_path)
+    prune_generations(data_dir)
+    logger.info(f"Published version {version}: {len(changes['inserted'])} inserted, "
+                f"{len(changes['updated'])} updated, {len(changes['removed'])} removed")
+    return version, changes
+
+
+def prune_generations(data_dir="data", keep=SNAPSHOT_RETENTION):
+    """Delete all but the newest `keep` generations (never the live one)"""
+    live = current_version(os.path.join(data_dir, "current.json"))
+    versions = list_generations(data_dir)
+    for version in versions[:-keep] if keep else versions:
+        if version == live:
+            continue
+        shutil.rmtree(os.path.join(data_dir, "snapshots", generation_name(version)), ignore_errors=True)
+        logger.info(f"Pruned snapshot generation {version}")
+
+
+def rollback(version, data_dir="data"):
+    """Point current.json back at a retained generation"""
+    with file_lock(PUBLISH_LOCK, data_dir):
+        return _rollback(version, data_dir)
+
+
+def _rollback(version, data_dir):
+    current_path = os.path.join(data_dir, "current.json")
+    if version not in list_generations(data_dir):
+        raise ValueError(f"Version {version} is not retained")
+    pointer = dict(read_current(current_path))
+    pointer.update({
+        "version": version,
+        "previous_version": int(pointer.get("version", 0)),
+        "sequence": pointer_sequence(pointer) + 1,
+        "path": os.path.join("snapshots", generation_name(version)),
+        "rolled_back_at": time.time(),
+    })
+    pointer.setdefault("last_version", version)
+    _write_json_atomic(current_path, pointer)
+    logger.info(f"Rolled back to version {version}")
+    return pointer
+
+
+def version_info(data_dir="data"):
+    """Live pointer plus the retained generations, for /api/versions"""
+    return {
+        "current": read_current(os.path.join(data_dir, "current.json")),
+        "generations": list_generations(data_dir),
+        "changelog_retention": CHANGELOG_RETENTION,
+        "snapshot_retention": SNAPSHOT_RETENTION,
+    }
+
+
+def _trim_changelog(path):
+    """Rewrite the change log once it holds twice the retained versions"""
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    if len(lines) <= CHANGELOG_RETENTION * 2:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.writelines(lines[-CHANGELOG_RETENTION:])
+    os.replace(tmp_path, path)
+
+
+def load_changelog(path=CHANGELOG_FILE):
+    """Parsed change log entries, cached until the file changes"""
+    global _changelog_cache
+    try:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return []
+
+    cached = _changelog_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with _changelog_lock:
+        entries = []
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        _changelog_cache = (key, entries)
+        return entries
+
+
+def changes_since(since, latest):
+    """
+    Net changes between version `since` and `latest`.
+    Follows each entry's base version back from `latest`, so rolled-back
+    versions are never mixed in. Returns {"inserted", "updated", "removed"} ID
+    lists, or None when the change log no longer links `latest` to `since`.
+    """
+    by_version = {e["version"]: e for e in load_changelog()}
+    chain = []
+    version = latest
+    while version > since:
+        entry = by_version.get(version)
+        if entry is None:
+            return None
+        chain.append(entry)
+        version = entry.get("base", version - 1)
+    if version != since:
+        return None
+
+    # Net effect per article: did it exist at `since`, does it exist now?
+    existed_before = {}
+    exists_now = {}
+    for entry in reversed(chain):
+        for aid in entry["inserted"]:
+            existed_before.setdefault(aid, False)
+            exists_now[aid] = True
+        for aid in entry["updated"]:
+            existed_before.setdefault(aid, True)
+            exists_now[aid] = True
+        for aid in entry["removed"]:
+            existed_before.setdefault(aid, True)
+            exists_now[aid] = False
+
+    inserted, updated, removed = [], [], []
+    for aid, now in exists_now.items():
+        before = existed_before[aid]
+        if now and not before:
+            inserted.append(aid)
+        elif now:
+            updated.append(aid)
+        elif before:
+            removed.append(aid)
+    return {"inserted": inserted, "updated": updated, "removed": removed}
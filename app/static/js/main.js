@@ -8,13 +8,16 @@ document.addEventListener('DOMContentLoaded', () => {
     setupNotifications();
     setInterval(updateClock, 1000);
 
-    // Refresh every 30 seconds
+    // Refresh every 30 seconds, but only while the live event stream is down
     setInterval(() => {
+        if (eventStreamOpen) return;
         fetchStats();
         fetchData();
         updateNotifications();
     }, 30000);
 
+    setupEventStream();
+
     // Modal Close Handler
     document.querySelector('.close-modal').addEventListener('click', () => {
         document.getElementById('detail-modal').style.display = 'none';
@@ -45,14 +48,23 @@ document.addEventListener('DOMContentLoaded', () => {
                 const response = await fetch('/api/refresh', { method: 'POST' });
                 const res = await response.json();
                 if (res.status === 'success') {
-                    setTimeout(() => {
-                        fetchStats();
-                        fetchData();
-                        updateNotifications();
+                    const finish = () => {
                         icon.classList.remove('fa-spin');
                         refreshBtn.disabled = false;
                         refreshBtn.style.opacity = '1';
-                    }, 2000);
+                    };
+                    if (eventStreamOpen) {
+                        // Data is reloaded by the pipeline_finished handler;
+                        // pipeline_failed only stops the spinner
+                        onPipelineDone = finish;
+                    } else {
+                        setTimeout(() => {
+                            fetchStats();
+                            fetchData();
+                            updateNotifications();
+                            finish();
+                        }, 2000);
+                    }
                 } else {
                     alert('Refresh failed: ' + res.message);
                     icon.classList.remove('fa-spin');
@@ -69,6 +81,45 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 });
 
+let eventStreamOpen = false;
+let onPipelineDone = null;
+
+function setupEventStream() {
+    if (!window.EventSource) return;
+
+    // The browser reconnects automatically (resuming from Last-Event-ID) after errors
+    const source = new EventSource('/api/events');
+    source.onopen = () => { eventStreamOpen = true; };
+    source.onerror = () => { eventStreamOpen = false; };
+
+    source.addEventListener('pipeline_finished', () => {
+        fetchStats();
+        fetchData();
+        updateNotifications();
+        pipelineDone();
+    });
+
+    source.addEventListener('pipeline_failed', (event) => {
+        console.warn('Pipeline run failed:', JSON.parse(event.data).error);
+        pipelineDone();
+    });
+
+    source.addEventListener('high_risk_article', () => {
+        const notifDot = document.getElementById('notif-dot');
+        if (notifDot) {
+            notifDot.style.display = 'block';
+            notifDot.classList.add('pulse');
+        }
+    });
+}
+
+function pipelineDone() {
+    if (onPipelineDone) {
+        onPipelineDone();
+        onPipelineDone = null;
+    }
+}
+
 function setupNotifications() {
     const notifBtn = document.getElementById('notif-btn');
     const notifDropdown = document.getElementById('notif-dropdown');
@@ -85,7 +136,7 @@ function setupNotifications() {
 
 async function updateNotifications() {
     try {
-        const response = await fetch('/api/data');
+        const response = await fetch('/api/data?fields=Title,Source,Link,impact_level,event_flag');
         const data = await response.json();
 
         // Filter for "High Risk" or "Major Event"
@@ -208,19 +259,46 @@ async function fetchStats() {
 let impactChart = null;
 let opsChart = null;
 
+let dataVersion = null;
+
 async function fetchData() {
     try {
-        const response = await fetch('/api/data');
-        const data = await response.json();
-        currentData = data; // Store globally
-
-        updateCharts(data);
-        updateSignals(data);
+        // After the first load only the articles changed since our version are sent
+        const url = dataVersion === null ? '/api/data/changes' : `/api/data/changes?since=${dataVersion}`;
+        const response = await fetch(url);
+        const delta = await response.json();
+        currentData = applyChanges(currentData, delta); // Store globally
+        dataVersion = delta.version;
+
+        updateCharts(currentData);
+        updateSignals(currentData);
     } catch (error) {
         console.error('Error fetching data:', error);
     }
 }
 
+function applyChanges(data, delta) {
+    if (delta.full) return delta.items;
+
+    const removed = new Set(delta.removed);
+    const updated = new Map(delta.updated.map(item => [item.article_id, item]));
+    const kept = data
+        .filter(item => !removed.has(item.article_id))
+        .map(item => updated.get(item.article_id) || item);
+    return applyLabels([...delta.inserted, ...kept], delta.labels);
+}
+
+function applyLabels(data, labels) {
+    // Cluster numbers and names are per run, so they arrive as one map
+    if (!labels) return data;
+    return data.map(item => {
+        const cid = labels.topic_cluster[item.article_id];
+        if (cid === undefined) return item;
+        const cluster = labels.clusters[cid] || {};
+        return { ...item, topic_cluster: cid, cluster_name: cluster.cluster_name, event_flag: cluster.event_flag };
+    });
+}
+
 function setupModalHandlers() {
     // National Activity Card
     const nationalCard = document.getElementById('list-national').closest('.card');
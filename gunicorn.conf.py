@@ -0,0 +1,19 @@
+"""
+Gunicorn settings for serving the dashboard with several workers:
+
+    python -m app.scheduler &
+    gunicorn run:app
+
+gevent workers serve every request, including each long-lived /api/events
+stream, from a greenlet, so open dashboards do not each hold an OS thread.
+"""
+
+import os
+
+bind = os.environ.get("SIGNALS_BIND", "0.0.0.0:5111")
+workers = int(os.environ.get("SIGNALS_WORKERS", "4"))
+worker_class = "gevent"
+# Concurrent connections (mostly idle event streams) per worker
+worker_connections = 1000
+# Streams send a heartbeat every 20 seconds, well inside this
+timeout = 60